@@ -1,40 +1,131 @@
 import os
-from flask import Flask, Blueprint, render_template, request, redirect, url_for, session, jsonify, flash, send_file
+from flask import Flask, Blueprint, render_template, request, redirect, url_for, session, jsonify, flash, send_file, g, has_app_context
+from flask.json.provider import DefaultJSONProvider
 from flask_wtf import FlaskForm, CSRFProtect
-from wtforms import StringField, PasswordField, FileField
+from wtforms import StringField, PasswordField, FileField, SelectField
 from wtforms.validators import DataRequired
-import pandas as pd
-import pyodbc
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
+import io
 import logging
+import time
 import uuid
+import base64
+import json
+from datetime import datetime
+from bulk_loader import DEPARTMENT_STATS_TABLE, DESIGNATION_STATS_TABLE, EMPLOYEE_COLUMNS
+from db_pool import ConnectionPool
+from backends import create_backend
+from cache import (DatasetGeneration, ResponseCache, ResultCache, compressible, encode_json, make_etag,
+                   preferred_encoding, select_variant)
+from ingest import ExcelChunkReader, ExcelFormatError, ImportValidationError, import_excel
+from jobs import ACTIVE_STATUSES, ImportJobManager
+from blob_store import BlobStore, is_digest
+from export import EXPORT_FORMATS, export_chunks, fetch_batches
+from workbook_template import (SCHEMA_VERSION, TEMPLATE_KINDS, TEMPLATE_NAMES, TemplateCache, TemplateTooLarge,
+                               build_template)
+from search_index import SearchIndex
+from roster_snapshot import DatabaseOnly, SnapshotLoader
+from metrics import (CONTENT_TYPE, PHASE_BUCKETS, ROW_BUCKETS, SIZE_BUCKETS, CountingIterable, Registry,
+                     RequestProfiler, RequestTimings, TimedConnection, TimedCursor)
 
 # Load environment variables
 load_dotenv()
 
+class TimedJSONProvider(DefaultJSONProvider):
+    """Adds the time spent encoding ``jsonify`` bodies to the request timings."""
+
+    def response(self, *args, **kwargs):
+        started = time.perf_counter()
+        response = super().response(*args, **kwargs)
+        timings = g.get('request_timings') if has_app_context() else None
+        if timings is not None:
+            timings.record('serialize', time.perf_counter() - started)
+        return response
+
 app = Flask(__name__)
-app.secret_key = os.urandom(24).hex()
+app.json = TimedJSONProvider(app)
+# Every worker process must sign sessions with the same key.
+app.secret_key = os.getenv('SECRET_KEY') or os.urandom(24).hex()
 app.config['UPLOAD_FOLDER'] = 'Uploads'
 app.config['BLOB_FOLDER'] = 'BlobStorage'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+app.config['STATE_FOLDER'] = 'State'
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', '512')) * 1024 * 1024
+app.config['UPLOAD_BATCH_SIZE'] = int(os.getenv('UPLOAD_BATCH_SIZE', '5000'))
+app.config['UPLOAD_LOAD_MODE'] = os.getenv('UPLOAD_LOAD_MODE', 'swap')
+app.config['RESULT_CACHE_SIZE'] = int(os.getenv('RESULT_CACHE_SIZE', '256'))
+app.config['RESULT_CACHE_TTL'] = int(os.getenv('RESULT_CACHE_TTL', '300'))
+app.config['RESPONSE_CACHE_SIZE'] = int(os.getenv('RESPONSE_CACHE_SIZE', '256'))
+app.config['RESPONSE_CACHE_MB'] = int(os.getenv('RESPONSE_CACHE_MB', '64'))
+app.config['IMPORT_WORKERS'] = int(os.getenv('IMPORT_WORKERS', '1'))
+app.config['EXPORT_BATCH_SIZE'] = int(os.getenv('EXPORT_BATCH_SIZE', '5000'))
+app.config['PROFILING_ENABLED'] = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+app.config['SNAPSHOT_ENABLED'] = os.getenv('SNAPSHOT_ENABLED', 'true').lower() == 'true'
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+app.config['BLOB_RETENTION_COUNT'] = int(os.getenv('BLOB_RETENTION_COUNT', '20'))
+app.config['BLOB_RETENTION_DAYS'] = int(os.getenv('BLOB_RETENTION_DAYS', '90'))
+app.config['BLOB_COMPACT_INTERVAL'] = int(os.getenv('BLOB_COMPACT_INTERVAL', '3600'))
 
 csrf = CSRFProtect(app)
 
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['BLOB_FOLDER'], exist_ok=True)
+os.makedirs(app.config['STATE_FOLDER'], exist_ok=True)
+os.makedirs(os.path.join(app.config['STATE_FOLDER'], 'reports'), exist_ok=True)
+
+dataset_generation = DatasetGeneration(os.path.join(app.config['STATE_FOLDER'], 'generation'))
+result_cache = ResultCache(maxsize=app.config['RESULT_CACHE_SIZE'], ttl=app.config['RESULT_CACHE_TTL'])
+response_cache = ResponseCache(maxsize=app.config['RESPONSE_CACHE_SIZE'], ttl=app.config['RESULT_CACHE_TTL'],
+                               max_bytes=app.config['RESPONSE_CACHE_MB'] * 1024 * 1024)
+search_index = SearchIndex()
+employee_snapshot = SnapshotLoader()
+blob_store = BlobStore(app.config['BLOB_FOLDER'])
+template_cache = TemplateCache()
+profiler = RequestProfiler(os.path.join(app.config['STATE_FOLDER'], 'profiles'))
+
+metrics_registry = Registry()
+REQUEST_LATENCY = metrics_registry.histogram(
+    'http_request_duration_seconds', 'Time from the start of a request until its body has been sent.',
+    ('blueprint', 'route', 'method', 'status'))
+REQUEST_PHASES = metrics_registry.histogram(
+    'http_request_phase_seconds', 'Time per request spent checking out a DB connection (connect), '
+    'executing statements (query), fetching rows (fetch) and encoding JSON (serialize).',
+    ('route', 'phase'))
+DB_ROWS = metrics_registry.histogram(
+    'db_rows_returned', 'Rows fetched from the database per request.', ('route',), ROW_BUCKETS)
+RESPONSE_SIZE = metrics_registry.histogram(
+    'http_response_size_bytes', 'Response body size.', ('route',), SIZE_BUCKETS)
+IMPORT_PHASES = metrics_registry.histogram(
+    'import_phase_seconds', 'Time per import job spent parsing, validating and inserting rows.',
+    ('mode', 'phase'), PHASE_BUCKETS)
+IMPORT_ROWS = metrics_registry.counter('import_rows_total', 'Rows loaded by successful import jobs.', ('mode',))
+IMPORT_JOBS = metrics_registry.counter('import_jobs_total', 'Finished import jobs.', ('mode', 'outcome'))
 
 auth_bp = Blueprint('auth', __name__)
 main_bp = Blueprint('main', __name__)
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
 DB_CONFIG = {
+    'backend': os.getenv('DB_BACKEND', 'mssql'),
+    'sqlite_path': os.getenv('DB_SQLITE_PATH', 'employees.db'),
+    'postgres_dsn': os.getenv('DB_POSTGRES_DSN', 'dbname=employeedb'),
     'server': os.getenv('DB_SERVER', 'localhost'),
     'database': os.getenv('DB_NAME', 'EmployeeDB'),
     'driver': os.getenv('DB_DRIVER', '{ODBC Driver 17 for SQL Server}'),
-    'trusted_connection': os.getenv('DB_TRUSTED_CONNECTION', 'yes')
+    'trusted_connection': os.getenv('DB_TRUSTED_CONNECTION', 'yes'),
+    'pool_min_size': int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+    'pool_max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+    'pool_idle_timeout': int(os.getenv('DB_POOL_IDLE_TIMEOUT', '300')),
+    'pool_checkout_timeout': int(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', '10'))
 }
 
+EMPLOYEE_FIELDS = {'id': 'ID', 'name': 'Name', 'email': 'Email', 'department': 'Department', 'designation': 'Designation'}
+EMPLOYER_FIELDS = ('id', 'name', 'department')
+MAX_PAGE_SIZE = 1000
+# The page size the search and employer pages request.
+PAGE_SIZE = 100
+MAX_SEARCH_RESULTS = 100
+
 ADMIN_USERNAME = 'admin'
 ADMIN_PASSWORD = 'admin123'
 
@@ -44,59 +135,365 @@ class LoginForm(FlaskForm):
 
 class UploadForm(FlaskForm):
     file = FileField('Excel File', validators=[DataRequired()])
+    mode = SelectField('Import Mode', choices=[
+        ('full', 'Replace the whole roster'),
+        ('merge', 'Merge changes only (insert, update and delete by ID)')
+    ], default='full')
 
-def get_db_connection(use_master=False):
-    try:
-        database = 'master' if use_master else DB_CONFIG['database']
-        conn_str = f"DRIVER={DB_CONFIG['driver']};SERVER={DB_CONFIG['server']};DATABASE={database};Trusted_Connection={DB_CONFIG['trusted_connection']}"
-        conn = pyodbc.connect(conn_str)
-        return conn
-    except Exception as e:
-        logging.error(f"Database connection error: {e}")
-        return None
+def create_pool(backend):
+    return ConnectionPool(
+        backend,
+        min_size=DB_CONFIG['pool_min_size'],
+        max_size=DB_CONFIG['pool_max_size'],
+        idle_timeout=DB_CONFIG['pool_idle_timeout'],
+        checkout_timeout=DB_CONFIG['pool_checkout_timeout']
+    )
 
-def init_db():
-    conn = get_db_connection(use_master=True)
-    if conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute(f"IF NOT EXISTS (SELECT * FROM sys.databases WHERE name = '{DB_CONFIG['database']}') CREATE DATABASE {DB_CONFIG['database']}")
-            conn.commit()
-            logging.info(f"Database {DB_CONFIG['database']} ready")
-        except Exception as e:
-            logging.error(f"Database creation error: {e}")
-        finally:
-            conn.close()
-    
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
+db_backend = create_backend(DB_CONFIG)
+db_pool = create_pool(db_backend)
+
+metrics_registry.gauge('db_pool_connections', 'Pooled connections by state.',
+                       lambda: {(state,): value for state, value in db_pool.stats().items() if state in ('idle', 'in_use')},
+                       ('state',))
+metrics_registry.gauge('db_pool_checkouts_total', 'Connections handed out by the pool.',
+                       lambda: db_pool.stats()['checkouts'], monotonic=True)
+metrics_registry.gauge('db_pool_timeouts_total', 'Checkouts that gave up waiting for a connection.',
+                       lambda: db_pool.stats()['timeouts'], monotonic=True)
+metrics_registry.gauge('db_pool_wait_seconds_total', 'Time spent waiting for pooled connections.',
+                       lambda: db_pool.stats()['wait_seconds_total'], monotonic=True)
+metrics_registry.gauge('result_cache_requests_total', 'Result cache lookups.',
+                       lambda: {('hit',): result_cache.hits, ('miss',): result_cache.misses}, ('result',),
+                       monotonic=True)
+metrics_registry.gauge('response_cache_requests_total', 'Encoded response cache lookups.',
+                       lambda: {('hit',): response_cache.hits, ('miss',): response_cache.misses}, ('result',),
+                       monotonic=True)
+metrics_registry.gauge('response_cache_bytes', 'Encoded and compressed response bodies held.',
+                       lambda: response_cache.nbytes)
+metrics_registry.gauge('dataset_generation', 'Current dataset generation.', dataset_generation.current)
+metrics_registry.gauge('search_index_rows', 'Employees in the search index.', lambda: len(search_index))
+metrics_registry.gauge('employee_snapshot_rows', 'Employees in the columnar snapshot.',
+                       lambda: len(employee_snapshot.snapshot) if employee_snapshot.snapshot else 0)
+metrics_registry.gauge('employee_snapshot_bytes', 'Approximate memory held by the columnar snapshot.',
+                       lambda: employee_snapshot.snapshot.nbytes if employee_snapshot.snapshot else 0)
+
+def get_db():
+    """Borrow a pooled connection for the current app context.
+
+    The connection is returned to the pool by ``release_db`` when the context
+    is torn down, so handlers must not close it themselves.
+    """
+    if 'db' not in g:
+        timings = g.get('request_timings') or RequestTimings()
+        started = time.perf_counter()
         try:
-            cursor.execute("IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID('employees') AND name = 'Email') ALTER TABLE employees ADD Email NVARCHAR(100) NOT NULL DEFAULT ''")
-            cursor.execute("IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID('employees') AND name = 'Designation') ALTER TABLE employees ADD Designation NVARCHAR(50) NOT NULL DEFAULT ''")
-            
-            cursor.execute('''
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='employees' AND xtype='U')
-                CREATE TABLE employees (
-                    ID INT PRIMARY KEY,
-                    Name NVARCHAR(100) NOT NULL,
-                    Email NVARCHAR(100) NOT NULL,
-                    Department NVARCHAR(50) NOT NULL,
-                    Designation NVARCHAR(50) NOT NULL
-                )
-            ''')
-            cursor.execute('''
-                IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_employees_Department' AND object_id = OBJECT_ID('employees'))
-                CREATE INDEX IX_employees_Department ON employees(Department)
-            ''')
-            conn.commit()
-            logging.info("Database table and index initialized successfully")
+            conn = db_pool.acquire()
         except Exception as e:
-            logging.error(f"Table initialization error: {e}")
+            logging.error(f"Database connection error: {e}")
+            return None
         finally:
-            conn.close()
+            timings.record('connect', time.perf_counter() - started)
+        g.db = TimedConnection(conn, timings.record)
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exc):
+    conn = g.pop('db', None)
+    if conn is not None:
+        db_pool.release(conn.raw)
+
+@app.before_request
+def start_request_metrics():
+    g.request_timings = RequestTimings()
+    if app.config['PROFILING_ENABLED'] and request.headers.get('X-Profile') and 'logged_in' in session:
+        g.profile = profiler.start()
+
+@app.after_request
+def finish_request_metrics(response):
+    timings = g.get('request_timings')
+    if timings is None:
+        return response
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile_id = uuid.uuid4().hex
+        profiler.stop(profile, profile_id, f'{request.method} {request.full_path}')
+        response.headers['X-Profile-Id'] = profile_id
+    if timings.phases:
+        response.headers['Server-Timing'] = timings.server_timing()
+
+    route = request.url_rule.rule if request.url_rule else '<unmatched>'
+    labels = (request.blueprint or '', route, request.method, response.status_code)
+
+    def observe(size):
+        REQUEST_LATENCY.observe(time.perf_counter() - timings.started, *labels)
+        for phase, seconds in timings.phases.items():
+            REQUEST_PHASES.observe(seconds, route, phase)
+        if 'query' in timings.phases:
+            DB_ROWS.observe(timings.rows, route)
+        RESPONSE_SIZE.observe(size, route)
+
+    if response.is_streamed and response.content_length is None:
+        # Streamed bodies are still being produced after this hook, so they
+        # are measured once the response is closed.
+        body = response.response = CountingIterable(response.response)
+        response.call_on_close(lambda: observe(body.size))
     else:
-        logging.error("Could not connect to database for table creation")
+        observe(response.content_length or 0)
+    return response
+
+@app.template_filter('timestamp')
+def format_timestamp(value):
+    return datetime.fromtimestamp(value).strftime('%Y-%m-%d %H:%M') if value else ''
+
+@app.teardown_request
+def stop_profile(exc):
+    # Only reached with a running profile when the response never got to
+    # finish_request_metrics.
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.stop(profile, uuid.uuid4().hex, f'{request.method} {request.full_path}')
+
+def parse_fields(value, allowed):
+    if not value:
+        return tuple(allowed)
+    fields = tuple(dict.fromkeys(field.strip().lower() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return fields
+
+def encode_cursor(name, emp_id):
+    return base64.urlsafe_b64encode(json.dumps([name, emp_id]).encode()).decode().rstrip('=')
+
+def decode_cursor(value):
+    try:
+        name, emp_id = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+        if not isinstance(name, str) or not isinstance(emp_id, int):
+            raise ValueError
+        return name, emp_id
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def build_employee_query(fields, department=None, after=None, limit=None):
+    """SQL selecting ``fields`` (then Name, ID as the sort key) ordered by (Name, ID).
+
+    ``after`` is a decoded (Name, ID) cursor; with ``limit`` one extra row is
+    requested so the caller can tell whether another page follows.
+    """
+    columns = [EMPLOYEE_FIELDS[field] for field in fields] + ['Name', 'ID']
+    where, params = [], []
+    if department:
+        where.append('Department = ?')
+        params.append(department)
+    if after:
+        where.append('(Name > ? OR (Name = ? AND ID > ?))')
+        params.extend([after[0], after[0], after[1]])
+    return db_backend.select(columns, 'employees', where, params, ['Name', 'ID'],
+                             limit + 1 if limit is not None else None)
+
+def query_employees(cursor, fields, department=None, after=None, limit=None):
+    """Select ``fields`` ordered by (Name, ID), optionally one keyset page at a time.
+
+    Returns the rows as dicts and the cursor for the next page (None on the
+    last page or when ``limit`` is not given).
+    """
+    cursor.execute(*build_employee_query(fields, department, after, limit))
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+    width = len(fields)
+    return [dict(zip(fields, row[:width])) for row in rows], next_cursor
+
+def parse_employee_args(args):
+    """Validate the /api/employees query arguments.
+
+    Returns ``(department, fields, after, after_key, limit)``; raises
+    ValueError with a message for the client.
+    """
+    # The pages send an empty department for all departments.
+    department = args.get('department') or None
+    is_employer = args.get('employer', 'false').lower() == 'true'
+    after = args.get('after')
+    # employer=true is the ID/Name/Department projection; fields= can
+    # narrow it further but never widen it.
+    fields = parse_fields(args.get('fields'), EMPLOYER_FIELDS if is_employer else tuple(EMPLOYEE_FIELDS))
+    # A limit that is not a number is an error, not a request for the
+    # whole, unpaged roster.
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+            if not 1 <= limit <= MAX_PAGE_SIZE:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    if after and limit is None:
+        raise ValueError('after requires limit')
+    after_key = decode_cursor(after) if after else None
+    return department, fields, after, after_key, limit
+
+def fetch_employee_page(conn, fields, department=None, after_key=None, limit=None):
+    cursor = conn.cursor()
+    try:
+        employees, next_cursor = query_employees(cursor, fields, department, after_key, limit)
+    finally:
+        cursor.close()
+    page = {'employees': employees}
+    if limit is not None:
+        page['next'] = next_cursor
+    return page
+
+def current_snapshot():
+    """The columnar snapshot at the current generation, or None.
+
+    A missing or stale snapshot is rebuilt in the background; until it is
+    ready, callers read from the database.
+    """
+    if not app.config['SNAPSHOT_ENABLED']:
+        return None
+    generation = dataset_generation.current()
+    snapshot = employee_snapshot.current(generation)
+    if snapshot is None:
+        employee_snapshot.start_sync(db_pool.connection, generation, then=warm_response_cache)
+    return snapshot
+
+def snapshot_page_body(snapshot, fields, department=None, after_key=None, limit=None):
+    """The JSON body ``fetch_employee_page`` + ``jsonify`` would produce, from the snapshot.
+
+    Raises ``DatabaseOnly`` when only the database can select the page exactly.
+    """
+    employees, last = snapshot.page(fields, department, after_key, limit)
+    body = b'{"employees":' + employees
+    if limit is not None:
+        body += b',"next":' + (json.dumps(encode_cursor(*last)).encode() if last else b'null')
+    return body + b'}'
+
+def fetch_departments(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'SELECT Department FROM {DEPARTMENT_STATS_TABLE} ORDER BY Department')
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def refresh_search_index(conn):
+    """Bring the search index up to the current dataset generation."""
+    generation = dataset_generation.current()
+    if search_index.generation != generation:
+        search_index.sync(conn, generation)
+
+def current_search_index():
+    """The search index, or None until it is first built.
+
+    An index behind the dataset generation is brought up to date in the
+    background and keeps serving its previous state meanwhile.
+    """
+    generation = dataset_generation.current()
+    if search_index.generation != generation:
+        search_index.start_sync(db_pool.connection, generation)
+    return search_index if search_index.generation is not None else None
+
+def refresh_snapshot(conn):
+    """Rebuild the columnar snapshot for the current dataset generation."""
+    if app.config['SNAPSHOT_ENABLED']:
+        return employee_snapshot.sync(conn, dataset_generation.current())
+
+def warm_response_cache(snapshot):
+    """Encode and compress the department list and the first page the search
+    and employer pages request, for all departments and for each one, at the
+    snapshot's generation.
+
+    The largest departments come first, and at most half of the cache is
+    filled, leaving room for other requests.
+    """
+    if not response_cache.maxsize:
+        return
+    generation = snapshot.generation
+    with db_pool.connection() as conn:
+        departments = fetch_departments(conn)
+    response_cache.warm(('departments',), generation, encode_json({'departments': departments}) + b'\n')
+    sizes = {department: end - start for department, (start, end) in snapshot.departments.items()
+             if department in snapshot.exact_departments}
+    count = max(0, (response_cache.maxsize // 2 - 3) // 2)
+    for department in [None] + sorted(sizes, key=sizes.get, reverse=True)[:count]:
+        for fields in (EMPLOYER_FIELDS, tuple(EMPLOYEE_FIELDS)):
+            response_cache.warm(('employees', department, fields, None, PAGE_SIZE), generation,
+                                snapshot_page_body(snapshot, fields, department, None, PAGE_SIZE) + b'\n')
+
+def not_modified(etag):
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
+def with_etag(response, etag, weak=False):
+    # no-cache lets browsers keep the body but revalidate it on every use.
+    response.set_etag(etag, weak=weak)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def timed(phase, fn, *args):
+    """Call ``fn(*args)``, adding the time it takes to the request's ``phase``."""
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        g.request_timings.record(phase, time.perf_counter() - started)
+
+def encoded_response(variants, etag):
+    """A JSON response from ``response_cache`` variants in the best accepted encoding.
+
+    Compressed bodies carry a weak ETag, the same for every encoding.
+    """
+    encoding, body = select_variant(variants, request.accept_encodings)
+    response = app.response_class(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if compressible(variants['identity']):
+        response.vary.add('Accept-Encoding')
+    return with_etag(response, etag, weak=encoding is not None)
+
+def init_db():
+    if not os.getenv('SECRET_KEY'):
+        logging.warning("SECRET_KEY is not set; using a random key, so sessions do not survive restarts "
+                        "and are not shared between worker processes")
+    try:
+        db_backend.create_database()
+    except Exception as e:
+        logging.error(f"Database creation error: {e}")
+    try:
+        with db_pool.connection() as conn:
+            db_backend.init_schema(conn)
+        logging.info(f"Database tables and indexes initialized successfully ({db_backend.dialect})")
+    except Exception as e:
+        logging.error(f"Table initialization error: {e}")
+
+def protected_blobs():
+    """Blobs compaction must keep: the live roster and any with a pending import."""
+    protected = {job['blob'] for job in import_jobs.active() if job.get('blob')}
+    live = blob_store.live_digest(dataset_generation.current())
+    if live:
+        protected.add(live)
+    return protected
+
+def start_worker():
+    """Per-process start-up: open the pool's minimum connections, resume import
+    jobs, start blob store compaction and build the employee snapshot and
+    search index."""
+    try:
+        db_pool.prefill()
+    except Exception as e:
+        logging.error(f"Could not prefill connection pool: {e}")
+    import_jobs.resume()
+    blob_store.start_compaction(
+        app.config['BLOB_COMPACT_INTERVAL'],
+        protect=protected_blobs,
+        keep=app.config['BLOB_RETENTION_COUNT'],
+        max_age_days=app.config['BLOB_RETENTION_DAYS']
+    )
+    current_snapshot()
+    current_search_index()
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -126,7 +523,102 @@ def employer():
     if 'logged_in' not in session or 'username' not in session:
         flash('Please log in to access this page.', 'danger')
         return redirect(url_for('auth.login'))
-    return render_template('employer.html')
+    return render_template('employer.html', page_size=PAGE_SIZE)
+
+class ImportJobError(Exception):
+    pass
+
+def run_import_job(job, progress):
+    filepath = job['path']
+    digest = job.get('blob')
+    outcome = 'failed'
+    try:
+        with ExcelChunkReader(filepath, chunk_size=app.config['UPLOAD_BATCH_SIZE']) as reader:
+            with db_pool.connection() as conn:
+                try:
+                    result = import_excel(
+                        reader, conn, db_backend,
+                        batch_size=app.config['UPLOAD_BATCH_SIZE'],
+                        mode=job['mode'],
+                        progress=progress
+                    )
+                except ImportValidationError as e:
+                    e.report_id = uuid.uuid4().hex
+                    e.report.write_csv(os.path.join(app.config['STATE_FOLDER'], 'reports', f'{e.report_id}.csv'))
+                    raise
+                except db_backend.module.IntegrityError as e:
+                    logging.error(f"Database integrity error: {e}")
+                    raise ImportJobError('Error saving data to database: Integrity constraint violation (e.g., duplicate ID)')
+                except db_backend.module.DataError as e:
+                    logging.error(f"Database data error: {e}")
+                    raise ImportJobError('Error saving data to database: Invalid data format (e.g., string too long)')
+        if job['mode'] != 'merge' or result['inserted'] or result['updated'] or result['deleted']:
+            generation = dataset_generation.bump()
+            try:
+                with db_pool.connection() as conn:
+                    refresh_search_index(conn)
+            except Exception as e:
+                logging.error(f"Search index refresh error: {e}")
+            try:
+                with db_pool.connection() as conn:
+                    snapshot = refresh_snapshot(conn)
+            except Exception as e:
+                snapshot = None
+                logging.error(f"Employee snapshot build error: {e}")
+            if snapshot is not None:
+                try:
+                    warm_response_cache(snapshot)
+                except Exception as e:
+                    logging.error(f"Response cache warm-up error: {e}")
+        else:
+            generation = dataset_generation.current()
+
+        if digest is None:
+            # Jobs queued before uploads went into the blob store.
+            with open(filepath, 'rb') as f:
+                digest, _ = blob_store.put(f, job['filename'])
+        blob_store.record_import(digest, 'succeeded', result, generation)
+        for phase, seconds in result['phases'].items():
+            IMPORT_PHASES.observe(seconds, job['mode'], phase)
+        IMPORT_ROWS.inc(job['mode'], amount=result['rows_loaded'])
+        outcome = 'succeeded'
+        return result
+    except (ExcelFormatError, ImportValidationError, ImportJobError):
+        raise
+    except Exception as e:
+        logging.error(f"File processing error: {e}")
+        raise ImportJobError(f'Error processing Excel file: {e}')
+    finally:
+        IMPORT_JOBS.inc(job['mode'], outcome)
+        if job.get('blob'):
+            if outcome != 'succeeded':
+                blob_store.record_import(digest, 'failed')
+        elif os.path.exists(filepath):
+            os.remove(filepath)
+
+def queue_blob_import(digest, mode):
+    """Queue an import of a stored upload unless it would not change anything.
+
+    Returns the redirect back to the upload page.
+    """
+    blob = blob_store.get(digest)
+    pending = import_jobs.get(blob['last_job_id']) if blob['last_job_id'] else None
+    if pending and pending['status'] in ACTIVE_STATUSES:
+        flash(f"{blob['filename']} is already being imported.", 'info')
+        return redirect(url_for('dashboard.upload', job=pending['id']))
+    if blob['imported_generation'] is not None and blob['imported_generation'] == dataset_generation.current():
+        flash(f"{blob['filename']} is identical to the roster that is already loaded; nothing was imported.", 'info')
+        return redirect(url_for('dashboard.upload'))
+    job = import_jobs.submit(blob_store.path(digest), blob['filename'], mode, blob=digest)
+    blob_store.record_job(digest, job['id'])
+    logging.info(f"Queued import job {job['id']} for {blob['filename']} (blob {digest})")
+    return redirect(url_for('dashboard.upload', job=job['id']))
+
+import_jobs = ImportJobManager(
+    os.path.join(app.config['STATE_FOLDER'], 'jobs'),
+    run_import_job,
+    max_workers=app.config['IMPORT_WORKERS']
+)
 
 @dashboard_bp.route('/upload', methods=['GET', 'POST'])
 def upload():
@@ -138,145 +630,358 @@ def upload():
     if form.validate_on_submit():
         file = form.file.data
         if file and file.filename.endswith('.xlsx'):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            blob_filename = f"{uuid.uuid4()}_{filename}"
-            blob_filepath = os.path.join(app.config['BLOB_FOLDER'], blob_filename)
-            file.save(filepath)
-            
-            try:
-                df = pd.read_excel(filepath)
-                
-                required_columns = ['ID', 'Name', 'Email', 'Department', 'Designation']
-                if not all(col in df.columns for col in required_columns):
-                    flash(f'Excel file must contain columns: {", ".join(required_columns)}', 'danger')
-                    return redirect(request.url)
-                
-                df = df[required_columns].dropna()
-                
-                if not df['ID'].apply(lambda x: isinstance(x, (int, float)) and x == int(x)).all():
-                    flash('All ID values must be integers', 'danger')
-                    return redirect(request.url)
-                
-                if df['ID'].duplicated().any():
-                    flash('ID values must be unique', 'danger')
-                    return redirect(request.url)
-                
-                if not df['Email'].str.contains(r'^[\w\.-]+@[\w\.-]+\.\w+$').all():
-                    flash('Invalid email format in Excel file', 'danger')
-                    return redirect(request.url)
-                
-                conn = get_db_connection()
-                if not conn:
-                    flash('Database connection error', 'danger')
-                    return redirect(request.url)
-                
-                cursor = conn.cursor()
-                try:
-                    cursor.execute('DELETE FROM employees')
-                    for _, row in df.iterrows():
-                        cursor.execute(
-                            'INSERT INTO employees (ID, Name, Email, Department, Designation) VALUES (?, ?, ?, ?, ?)',
-                            int(row['ID']), str(row['Name']), str(row['Email']), str(row['Department']), str(row['Designation'])
-                        )
-                    conn.commit()
-                    flash(f'Successfully uploaded {len(df)} employees', 'success')
-                    
-                    os.rename(filepath, blob_filepath)
-                    logging.info(f"File saved to blob storage: {blob_filepath}")
-                    
-                except pyodbc.IntegrityError as e:
-                    logging.error(f"Database integrity error: {e}")
-                    flash(f'Error saving data to database: Integrity constraint violation (e.g., duplicate ID)', 'danger')
-                except pyodbc.DataError as e:
-                    logging.error(f"Database data error: {e}")
-                    flash(f'Error saving data to database: Invalid data format (e.g., string too long)', 'danger')
-                except Exception as e:
-                    logging.error(f"Database insert error: {e}")
-                    flash(f'Error saving data to database: {str(e)}', 'danger')
-                finally:
-                    conn.close()
-                
-            except Exception as e:
-                logging.error(f"File processing error: {e}")
-                flash('Error processing Excel file', 'danger')
-            
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            digest, _ = blob_store.put(file.stream, secure_filename(file.filename))
+            mode = 'merge' if form.mode.data == 'merge' else app.config['UPLOAD_LOAD_MODE']
+            return queue_blob_import(digest, mode)
         else:
             flash('Please upload an Excel file (.xlsx)', 'danger')
     
-    return render_template('upload.html', form=form)
+    blobs = blob_store.list(limit=10)
+    live = blob_store.live_digest(dataset_generation.current())
+    return render_template('upload.html', form=form, job_id=request.args.get('job'), blobs=blobs, live_blob=live)
+
+@dashboard_bp.route('/blobs/<digest>/import', methods=['POST'])
+def reimport_blob(digest):
+    if 'logged_in' not in session or 'username' not in session:
+        flash('Please log in to access this page.', 'danger')
+        return redirect(url_for('auth.login'))
+    if not is_digest(digest) or not blob_store.get(digest) or not os.path.exists(blob_store.path(digest)):
+        flash('Stored upload not found.', 'danger')
+        return redirect(url_for('dashboard.upload'))
+    mode = 'merge' if request.form.get('mode') == 'merge' else app.config['UPLOAD_LOAD_MODE']
+    return queue_blob_import(digest, mode)
+
+@dashboard_bp.route('/upload/errors/<report_id>')
+def validation_report(report_id):
+    if 'logged_in' not in session or 'username' not in session:
+        flash('Please log in to access this page.', 'danger')
+        return redirect(url_for('auth.login'))
+    try:
+        report_id = uuid.UUID(hex=report_id).hex
+    except ValueError:
+        return jsonify({'error': 'Report not found'}), 404
+    report_path = os.path.join(app.config['STATE_FOLDER'], 'reports', f'{report_id}.csv')
+    if not os.path.exists(report_path):
+        return jsonify({'error': 'Report not found'}), 404
+    return send_file(os.path.abspath(report_path), as_attachment=True, download_name='validation_errors.csv')
 
 @dashboard_bp.route('/search')
 def search():
     if 'logged_in' not in session or 'username' not in session:
         flash('Please log in to access this page.', 'danger')
         return redirect(url_for('auth.login'))
-    return render_template('search.html')
+    return render_template('search.html', page_size=PAGE_SIZE)
+
+def build_employee_template(kind):
+    if kind == 'blank':
+        return build_template()
+    with db_pool.connection() as conn:
+        # Read before the roster cursor is opened: SQL Server connections
+        # serve one result set at a time.
+        departments = fetch_departments(conn)
+        if kind == 'departments':
+            return build_template(rows=(), departments=departments)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(*db_backend.select(EMPLOYEE_COLUMNS, 'employees', order_by=['ID']))
+            rows = (row for batch in fetch_batches(cursor, app.config['EXPORT_BATCH_SIZE']) for row in batch)
+            return build_template(rows, departments=departments)
+        finally:
+            cursor.close()
 
 @dashboard_bp.route('/download_template')
 def download_template():
-    template_data = [
-        {'ID': 1, 'Name': 'John Doe', 'Email': 'john.doe@example.com', 'Department': 'IT', 'Designation': 'Software Engineer'}
-    ]
-    df = pd.DataFrame(template_data)
-    template_path = os.path.join(app.config['UPLOAD_FOLDER'], 'employees_template.xlsx')
-    df.to_excel(template_path, index=False)
-    return send_file(template_path, as_attachment=True, download_name='employees_template.xlsx')
+    kind = request.args.get('prefill', 'blank')
+    if kind not in TEMPLATE_KINDS:
+        flash(f"Unknown template; choose one of: {', '.join(TEMPLATE_KINDS)}", 'danger')
+        return redirect(url_for('dashboard.upload'))
+    if kind != 'blank' and ('logged_in' not in session or 'username' not in session):
+        flash('Please log in to access this page.', 'danger')
+        return redirect(url_for('auth.login'))
+
+    generation = 0 if kind == 'blank' else dataset_generation.current()
+    etag = make_etag('template', (kind, SCHEMA_VERSION), generation)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    try:
+        data = template_cache.get(kind, (SCHEMA_VERSION, generation), lambda: build_employee_template(kind))
+    except TemplateTooLarge as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('dashboard.upload'))
+    except Exception as e:
+        logging.error(f"Template build error: {e}")
+        flash('Could not build the template.', 'danger')
+        return redirect(url_for('dashboard.upload'))
+    response = send_file(io.BytesIO(data), mimetype=EXPORT_FORMATS['xlsx'], as_attachment=True,
+                         download_name=TEMPLATE_NAMES[kind])
+    return with_etag(response, etag)
 
 @main_bp.route('/api/employees')
 def get_employees():
     if 'logged_in' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    department = request.args.get('department')
-    is_employer = request.args.get('employer', 'false').lower() == 'true'
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
+    try:
+        department, fields, after, after_key, limit = parse_employee_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    cache_key = ('employees', department, fields, after, limit)
+    generation = dataset_generation.current()
+    etag = make_etag('employees', cache_key, generation)
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    encoding = preferred_encoding(request.accept_encodings)
+    variants = response_cache.get(cache_key, generation, encoding)
+    if variants is not None:
+        return encoded_response(variants, etag)
+
+    body = None
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        try:
+            body = timed('serialize', snapshot_page_body, snapshot, fields, department, after_key, limit)
+        except DatabaseOnly:
+            pass
+    if body is None:
+        conn = get_db()
+        if not conn:
+            return jsonify({'error': 'Database connection error'}), 500
         try:
-            if is_employer:
-                if department:
-                    cursor.execute('SELECT ID, Name, Department FROM employees WHERE Department = ? ORDER BY Name', department)
-                else:
-                    cursor.execute('SELECT ID, Name, Department FROM employees ORDER BY Name')
-                employees = [{'id': row[0], 'name': row[1], 'department': row[2]} for row in cursor.fetchall()]
-            else:
-                if department:
-                    cursor.execute('SELECT ID, Name, Email, Department, Designation FROM employees WHERE Department = ? ORDER BY Name', department)
-                else:
-                    cursor.execute('SELECT ID, Name, Email, Department, Designation FROM employees ORDER BY Name')
-                employees = [{'id': row[0], 'name': row[1], 'email': row[2], 'department': row[3], 'designation': row[4]} for row in cursor.fetchall()]
-            return jsonify({'employees': employees})
+            page = fetch_employee_page(conn, fields, department, after_key, limit)
         except Exception as e:
             logging.error(f"Database query error: {e}")
             return jsonify({'error': 'Database error'}), 500
-        finally:
-            conn.close()
-    else:
+        body = timed('serialize', encode_json, page)
+    variants = timed('compress', response_cache.set, cache_key, generation, body + b'\n', encoding)
+    return encoded_response(variants, etag)
+
+@main_bp.route('/api/employees/export')
+def export_employees():
+    if 'logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    fmt = request.args.get('format', 'ndjson').lower()
+    department = request.args.get('department')
+    is_employer = request.args.get('employer', 'false').lower() == 'true'
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        fields = parse_fields(request.args.get('fields'), EMPLOYER_FIELDS if is_employer else tuple(EMPLOYEE_FIELDS))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    etag = make_etag('export', (fmt, department, fields), dataset_generation.current())
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+
+    # The app context is torn down before a streamed body is sent, so the
+    # connection is borrowed here directly and returned when the response
+    # is closed rather than through get_db().
+    timings = g.request_timings
+    started = time.perf_counter()
+    try:
+        conn = db_pool.acquire()
+    except Exception as e:
+        logging.error(f"Database connection error: {e}")
         return jsonify({'error': 'Database connection error'}), 500
+    finally:
+        timings.record('connect', time.perf_counter() - started)
+    cursor = TimedCursor(db_backend.streaming_cursor(conn), timings.record)
+
+    def release():
+        cursor.close()
+        db_pool.release(conn)
+
+    try:
+        cursor.execute(*build_employee_query(fields, department))
+    except Exception as e:
+        release()
+        logging.error(f"Database query error: {e}")
+        return jsonify({'error': 'Database error'}), 500
+
+    headers = [EMPLOYEE_FIELDS[field] for field in fields]
+    chunks = export_chunks(fmt, cursor, fields, headers, batch_size=app.config['EXPORT_BATCH_SIZE'])
+    response = app.response_class(chunks, mimetype=EXPORT_FORMATS[fmt])
+    response.call_on_close(release)
+    response.headers['Content-Disposition'] = f'attachment; filename=employees.{fmt}'
+    return with_etag(response, etag)
+
+@main_bp.route('/api/employees/search')
+def search_employees():
+    if 'logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    query = request.args.get('q', '').strip()
+    department = request.args.get('department')
+    is_employer = request.args.get('employer', 'false').lower() == 'true'
+    fuzzy = request.args.get('fuzzy', 'true').lower() != 'false'
+    try:
+        fields = parse_fields(request.args.get('fields'), EMPLOYER_FIELDS if is_employer else tuple(EMPLOYEE_FIELDS))
+        limit = request.args.get('limit', 20, type=int)
+        if not 1 <= limit <= MAX_SEARCH_RESULTS:
+            raise ValueError(f'limit must be between 1 and {MAX_SEARCH_RESULTS}')
+        if not query:
+            raise ValueError('q is required')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    index = current_search_index()
+    if index is None:
+        return jsonify({'error': 'The search index is still being built'}), 503, {'Retry-After': '5'}
+
+    employees = index.search(query, limit=limit, department=department, fuzzy=fuzzy)
+    return jsonify({'employees': [{field: employee[field] for field in fields} for employee in employees]})
+
+@main_bp.route('/api/imports/<job_id>')
+def get_import(job_id):
+    if 'logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    job = import_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Import job not found'}), 404
+    status = import_jobs.public(job)
+    if status['report_id']:
+        status['report_url'] = url_for('dashboard.validation_report', report_id=status['report_id'])
+    return jsonify(status)
+
+@main_bp.route('/api/blobs')
+def list_blobs():
+    if 'logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    limit = request.args.get('limit', 50, type=int)
+    live = blob_store.live_digest(dataset_generation.current())
+    blobs = blob_store.list(limit=max(1, min(limit, 500)))
+    for blob in blobs:
+        blob['live'] = blob['sha256'] == live
+    return jsonify({'blobs': blobs})
+
+@main_bp.route('/api/blobs/<digest>/diff')
+def diff_blob(digest):
+    """What importing a stored upload in merge mode would change in the live table."""
+    if 'logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    if not is_digest(digest) or not blob_store.get(digest) or not os.path.exists(blob_store.path(digest)):
+        return jsonify({'error': 'Stored upload not found'}), 404
+    cache_key = ('blob_diff', digest)
+    generation = dataset_generation.current()
+    etag = make_etag('blob_diff', cache_key, generation)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    diff = result_cache.get(cache_key, generation)
+    if diff is not None:
+        return with_etag(jsonify(diff), etag)
+
+    conn = get_db()
+    if not conn:
+        return jsonify({'error': 'Database connection error'}), 500
+    try:
+        with ExcelChunkReader(blob_store.path(digest), chunk_size=app.config['UPLOAD_BATCH_SIZE']) as reader:
+            result = import_excel(reader, conn, db_backend, batch_size=app.config['UPLOAD_BATCH_SIZE'],
+                                  mode='merge', dry_run=True)
+    except ExcelFormatError as e:
+        return jsonify({'error': str(e)}), 422
+    except ImportValidationError as e:
+        report_id = uuid.uuid4().hex
+        e.report.write_csv(os.path.join(app.config['STATE_FOLDER'], 'reports', f'{report_id}.csv'))
+        return jsonify({'error': str(e), 'report_url': url_for('dashboard.validation_report', report_id=report_id)}), 422
+    except Exception as e:
+        logging.error(f"Blob diff error: {e}")
+        return jsonify({'error': 'Error comparing the stored upload with the live table'}), 500
+
+    blob_store.record_row_count(digest, result['rows_loaded'])
+    diff = {
+        'sha256': digest,
+        'rows': result['rows_loaded'],
+        'inserted': result['inserted'],
+        'updated': result['updated'],
+        'deleted': result['deleted'],
+        'unchanged': result['unchanged'],
+        'samples': result['samples'],
+    }
+    result_cache.set(cache_key, generation, diff)
+    return with_etag(jsonify(diff), etag)
 
 @main_bp.route('/api/departments')
 def get_departments():
     if 'logged_in' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    conn = get_db_connection()
+    cache_key = ('departments',)
+    generation = dataset_generation.current()
+    etag = make_etag('departments', cache_key, generation)
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    encoding = preferred_encoding(request.accept_encodings)
+    variants = response_cache.get(cache_key, generation, encoding)
+    if variants is not None:
+        return encoded_response(variants, etag)
+
+    conn = get_db()
+    if not conn:
+        return jsonify({'error': 'Database connection error'}), 500
+    try:
+        departments = fetch_departments(conn)
+    except Exception as e:
+        logging.error(f"Database query error: {e}")
+        return jsonify({'error': 'Database error'}), 500
+    body = timed('serialize', encode_json, {'departments': departments})
+    variants = timed('compress', response_cache.set, cache_key, generation, body + b'\n', encoding)
+    return encoded_response(variants, etag)
+
+@main_bp.route('/api/departments/stats')
+def get_department_stats():
+    if 'logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    department = request.args.get('department')
+    cache_key = ('department_stats', department)
+    generation = dataset_generation.current()
+    etag = make_etag('department_stats', cache_key, generation)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    stats = result_cache.get(cache_key, generation)
+    if stats is not None:
+        return with_etag(jsonify(stats), etag)
+
+    conn = get_db()
     if conn:
         cursor = conn.cursor()
         try:
-            cursor.execute('SELECT DISTINCT Department FROM employees ORDER BY Department')
-            departments = [row[0] for row in cursor.fetchall()]
-            return jsonify({'departments': departments})
+            where, params = '', []
+            if department:
+                where, params = ' WHERE Department = ?', [department]
+            cursor.execute(f'SELECT Department, Headcount FROM {DEPARTMENT_STATS_TABLE}{where} ORDER BY Department', params)
+            departments = {name: {'department': name, 'headcount': headcount, 'designations': {}}
+                           for name, headcount in cursor.fetchall()}
+            cursor.execute(f'SELECT Department, Designation, Headcount FROM {DESIGNATION_STATS_TABLE}{where} '
+                           f'ORDER BY Department, Designation', params)
+            for name, designation, headcount in cursor.fetchall():
+                departments[name]['designations'][designation] = headcount
+            stats = {
+                'total': sum(item['headcount'] for item in departments.values()),
+                'departments': list(departments.values())
+            }
+            result_cache.set(cache_key, generation, stats)
+            return with_etag(jsonify(stats), etag)
         except Exception as e:
             logging.error(f"Database query error: {e}")
             return jsonify({'error': 'Database error'}), 500
         finally:
-            conn.close()
+            cursor.close()
     else:
         return jsonify({'error': 'Database connection error'}), 500
 
+@main_bp.route('/metrics')
+def metrics():
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return app.response_class(metrics_registry.render(), content_type=CONTENT_TYPE)
+
 app.register_blueprint(auth_bp)
 app.register_blueprint(main_bp)
 app.register_blueprint(dashboard_bp)
@@ -284,4 +989,19 @@ app.register_blueprint(dashboard_bp)
 if __name__ == '__main__':
     logging.basicConfig(filename='app.log', level=logging.INFO)
     init_db()
+    try:
+        db_pool.prefill()
+    except Exception as e:
+        logging.error(f"Could not prefill connection pool: {e}")
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Only the reloader's child process serves requests and runs jobs.
+        import_jobs.resume()
+        blob_store.start_compaction(
+            app.config['BLOB_COMPACT_INTERVAL'],
+            protect=protected_blobs,
+            keep=app.config['BLOB_RETENTION_COUNT'],
+            max_age_days=app.config['BLOB_RETENTION_DAYS']
+        )
+        current_snapshot()
+        current_search_index()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""ASGI entry point for the read endpoints, serving them from an event loop.
+
+    uvicorn asgi:app --workers 4
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+
+Only ``GET /api/employees``, ``GET /api/departments`` and ``/metrics`` are
+served here; a reverse proxy sends everything else to the WSGI app
+(``wsgi.py``).  Both read the same session cookie, so ``SECRET_KEY`` must be
+set for both.
+
+Checking the session, the encoded response cache (with ``Accept-Encoding``
+negotiation) and ETag revalidation all happen on the event loop, so cache
+hits and ``304`` responses use no thread.  Building a body that is not
+cached, and compressing one for an encoding it is not cached in, runs on
+the default executor.  pyodbc, sqlite3 and psycopg2 only have blocking
+calls, so queries run on an executor with one thread per pooled connection:
+in-flight requests waiting for the database wait as coroutines, and the
+thread count is bounded by the pool size rather than by the number of
+concurrent requests.
+"""
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_accept_header, parse_cookie, parse_etags
+
+from app import (DB_CONFIG, REQUEST_LATENCY, app as flask_app, current_snapshot, dataset_generation, db_pool,
+                 fetch_departments, fetch_employee_page, make_etag, metrics_registry, parse_employee_args,
+                 response_cache, snapshot_page_body, start_worker)
+from cache import compressible, encode_json, lacks_encoding, preferred_encoding, select_variant
+from metrics import CONTENT_TYPE
+from roster_snapshot import DatabaseOnly
+
+db_executor = ThreadPoolExecutor(max_workers=DB_CONFIG['pool_max_size'], thread_name_prefix='db')
+session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+
+
+def call_with_connection(fn, *args):
+    """Run ``fn(conn, *args)`` with a pooled connection (on an executor thread)."""
+    conn = db_pool.acquire()
+    try:
+        return fn(conn, *args)
+    finally:
+        db_pool.release(conn)
+
+
+async def run_db(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(db_executor, call_with_connection, fn, *args)
+
+
+async def run_cpu(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+async def cache_body(cache_key, generation, body, encoding):
+    """Put ``body`` (compressed with ``encoding``) in the response cache; returns its variants."""
+    return await run_cpu(response_cache.set, cache_key, generation, body + b'\n', encoding)
+
+
+async def cached_body(cache_key, generation, encoding):
+    """Cached variants including ``encoding``, or None; only compressing a missing copy leaves the loop."""
+    variants = response_cache.get(cache_key, generation)
+    if variants is not None and lacks_encoding(variants, encoding):
+        variants = await run_cpu(response_cache.add_encoding, cache_key, generation, variants, encoding)
+    return variants
+
+
+def logged_in(headers):
+    cookies = parse_cookie(headers.get('cookie', ''))
+    value = cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not value:
+        return False
+    try:
+        session = session_serializer.loads(value, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return False
+    return 'logged_in' in session
+
+
+async def get_employees(args, if_none_match, encoding):
+    try:
+        department, fields, after, after_key, limit = parse_employee_args(args)
+    except ValueError as e:
+        return 400, {'error': str(e)}, None
+
+    cache_key = ('employees', department, fields, after, limit)
+    generation = dataset_generation.current()
+    etag = make_etag('employees', cache_key, generation)
+    if if_none_match.contains_weak(etag):
+        return 304, None, etag
+    variants = await cached_body(cache_key, generation, encoding)
+    if variants is None:
+        body = None
+        snapshot = current_snapshot()
+        if snapshot is not None:
+            try:
+                body = await run_cpu(snapshot_page_body, snapshot, fields, department, after_key, limit)
+            except DatabaseOnly:
+                pass
+        if body is None:
+            try:
+                page = await run_db(fetch_employee_page, fields, department, after_key, limit)
+            except Exception as e:
+                logging.error(f"Database query error: {e}")
+                return 500, {'error': 'Database error'}, None
+            body = encode_json(page)
+        variants = await cache_body(cache_key, generation, body, encoding)
+    return 200, variants, etag
+
+
+async def get_departments(args, if_none_match, encoding):
+    cache_key = ('departments',)
+    generation = dataset_generation.current()
+    etag = make_etag('departments', cache_key, generation)
+    if if_none_match.contains_weak(etag):
+        return 304, None, etag
+    variants = await cached_body(cache_key, generation, encoding)
+    if variants is None:
+        try:
+            departments = await run_db(fetch_departments)
+        except Exception as e:
+            logging.error(f"Database query error: {e}")
+            return 500, {'error': 'Database error'}, None
+        variants = await cache_body(cache_key, generation, encode_json({'departments': departments}), encoding)
+    return 200, variants, etag
+
+
+ROUTES = {
+    '/api/employees': get_employees,
+    '/api/departments': get_departments,
+}
+
+
+async def respond(send, status, body=b'', content_type='application/json', etag=None, encoding=None, vary=False):
+    headers = [(b'content-length', str(len(body)).encode())]
+    if body:
+        headers.append((b'content-type', content_type.encode()))
+    if encoding:
+        headers.append((b'content-encoding', encoding.encode()))
+    if vary:
+        headers.append((b'vary', b'Accept-Encoding'))
+    if etag:
+        # Same caching headers as with_etag() in app.py, and a weak ETag
+        # for compressed bodies as in encoded_response().
+        headers.append((b'etag', f'{"W/" if encoding else ""}"{etag}"'.encode()))
+        headers.append((b'cache-control', b'private, no-cache'))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def handle(scope, headers):
+    """Return ``(status, body bytes, content type, etag, content encoding, vary)`` for one request.
+
+    Handlers return a dict of ``response_cache`` variants for 200s and a
+    plain object for errors.
+    """
+    path = scope['path']
+    if path == '/metrics':
+        token = flask_app.config['METRICS_TOKEN']
+        if token and headers.get('authorization') != f'Bearer {token}':
+            return 401, b'{"error":"Unauthorized"}', 'application/json', None, None, False
+        return 200, metrics_registry.render().encode(), CONTENT_TYPE, None, None, False
+    handler = ROUTES.get(path)
+    if handler is None:
+        return 404, b'{"error":"Not found"}', 'application/json', None, None, False
+    if scope['method'] != 'GET':
+        return 405, b'{"error":"Method not allowed"}', 'application/json', None, None, False
+    if not logged_in(headers):
+        return 401, b'{"error":"Unauthorized"}', 'application/json', None, None, False
+
+    args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+    accept_encodings = parse_accept_header(headers.get('accept-encoding'))
+    status, data, etag = await handler(args, parse_etags(headers.get('if-none-match')),
+                                       preferred_encoding(accept_encodings))
+    encoding, vary = None, False
+    if data is None:
+        body = b''
+    elif status == 200:
+        encoding, body = select_variant(data, accept_encodings)
+        vary = compressible(data['identity'])
+    else:
+        body = json.dumps(data, separators=(',', ':'), sort_keys=True).encode()
+    return status, body, 'application/json', etag, encoding, vary
+
+
+async def lifespan(receive, send):
+    loop = asyncio.get_running_loop()
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # The WSGI app owns the schema; this process only needs its
+            # connections and any import jobs left behind.
+            try:
+                await loop.run_in_executor(db_executor, start_worker)
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            db_executor.shutdown(wait=True)
+            db_pool.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    started = time.perf_counter()
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+    status, body, content_type, etag, encoding, vary = await handle(scope, headers)
+    await respond(send, status, body, content_type, etag, encoding, vary)
+    route = scope['path'] if scope['path'] in ROUTES or scope['path'] == '/metrics' else '<unmatched>'
+    REQUEST_LATENCY.observe(time.perf_counter() - started, 'asgi', route, scope['method'], status)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    logging.basicConfig(filename='app.log', level=logging.INFO)
+    uvicorn.run('asgi:app', host='0.0.0.0', port=8001)
@@ -0,0 +1,391 @@
+"""Storage backends: SQL Server, PostgreSQL and SQLite.
+
+Each backend is also the connection factory for ``db_pool.ConnectionPool``
+(``dialect``, ``connect()`` and ``ping(conn)``) and supplies the few
+primitives that differ between engines:
+
+* schema setup (``create_database``, ``init_schema``) with each engine's
+  "create if missing" idiom,
+* bulk writes (``bulk_insert``, ``executemany``) using the engine's fast
+  path: pyodbc ``fast_executemany``, psycopg2 ``execute_values`` /
+  ``execute_batch``, sqlite3 ``executemany``,
+* the staging-table swap used by ``BulkLoader``,
+* paginated reads (``select`` renders ``TOP`` or ``LIMIT``) and
+  ``streaming_cursor`` for reads too large to buffer.
+
+Everything else, including the GROUP BY aggregates behind the department
+summary, is plain SQL with ``?`` placeholders shared by all three.  The
+PostgreSQL connection is wrapped so its cursors accept ``?`` as well.
+
+Driver modules are imported on first use, so only the configured engine's
+driver has to be installed.
+"""
+import importlib
+import logging
+import sqlite3
+import time
+import uuid
+
+from bulk_loader import (CREATE_TABLE_SQL, DEPARTMENT_STATS_TABLE, EMPLOYEE_COLUMNS, INDEXES, INSERT_SQL,
+                         OLD_TABLE, STATS_TABLES, TABLE, refresh_department_stats)
+
+BACKENDS = ('mssql', 'postgresql', 'sqlite')
+
+
+class Backend:
+    dialect = None
+    module_name = None
+
+    @property
+    def module(self):
+        """The DB-API driver module; its ``IntegrityError``/``DataError`` classify failures."""
+        return importlib.import_module(self.module_name)
+
+    def connect(self):
+        raise NotImplementedError
+
+    def ping(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def create_database(self):
+        """Create the database itself if the engine needs that done separately."""
+
+    def init_schema(self, conn):
+        """Create missing tables and indexes and fill an empty department summary."""
+        cursor = conn.cursor()
+        try:
+            self.create_table(cursor, TABLE, CREATE_TABLE_SQL.format(table=TABLE))
+            for name, columns in INDEXES:
+                self.create_index(cursor, name, TABLE, columns)
+            for name, create_sql in STATS_TABLES.items():
+                self.create_table(cursor, name, create_sql)
+            # Databases created before the summary existed get it filled once
+            # here; afterwards every import keeps it current.
+            cursor.execute(f'SELECT COUNT(*) FROM {DEPARTMENT_STATS_TABLE}')
+            if cursor.fetchone()[0] == 0:
+                refresh_department_stats(cursor)
+            conn.commit()
+        finally:
+            cursor.close()
+
+    def ddl(self, sql):
+        """Adapt the schema's SQL Server column types to the engine."""
+        return sql
+
+    def create_table(self, cursor, name, create_sql):
+        cursor.execute(self.ddl(create_sql).replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1))
+
+    def create_index(self, cursor, name, table, columns):
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})')
+
+    def drop_table(self, cursor, name):
+        cursor.execute(f'DROP TABLE IF EXISTS {name}')
+
+    def begin(self, conn, cursor):
+        """Make sure a transaction is open before DDL that must be atomic with DML."""
+
+    def executemany(self, cursor, sql, rows):
+        cursor.executemany(sql, rows)
+
+    def bulk_insert(self, cursor, table, rows):
+        self.executemany(cursor, INSERT_SQL.format(table=table), rows)
+
+    def swap_in(self, cursor, staging, table):
+        """Replace ``table`` with the loaded ``staging`` table inside the open transaction."""
+        # Index names are schema-wide here, so the indexes are created after
+        # the old table (and its indexes) has been dropped.
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+        cursor.execute(f'ALTER TABLE {staging} RENAME TO {table}')
+        for name, columns in INDEXES:
+            cursor.execute(f'CREATE INDEX {name} ON {table}({columns})')
+
+    def select(self, columns, table, where=(), params=(), order_by=None, limit=None):
+        """SQL and parameters for a ``SELECT`` of at most ``limit`` rows."""
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        params = list(params)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        if order_by:
+            sql += ' ORDER BY ' + ', '.join(order_by)
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return sql, params
+
+    def streaming_cursor(self, conn):
+        """A cursor whose ``fetchmany`` does not hold the whole result in memory."""
+        return conn.cursor()
+
+
+class SqlServerBackend(Backend):
+    dialect = 'mssql'
+    module_name = 'pyodbc'
+
+    def __init__(self, server, database, driver='{ODBC Driver 17 for SQL Server}', trusted_connection='yes'):
+        self.server = server
+        self.database = database
+        self.driver = driver
+        self.trusted_connection = trusted_connection
+
+    def connection_string(self, database=None):
+        return (f"DRIVER={self.driver};SERVER={self.server};DATABASE={database or self.database};"
+                f"Trusted_Connection={self.trusted_connection}")
+
+    def connect(self, database=None):
+        return self.module.connect(self.connection_string(database))
+
+    def create_database(self):
+        conn = self.connect('master')
+        try:
+            conn.autocommit = True
+            conn.cursor().execute(f"IF NOT EXISTS (SELECT * FROM sys.databases WHERE name = '{self.database}') "
+                                  f"CREATE DATABASE {self.database}")
+            logging.info(f"Database {self.database} ready")
+        finally:
+            conn.close()
+
+    def init_schema(self, conn):
+        cursor = conn.cursor()
+        try:
+            # Tables created by early versions lack these columns.
+            cursor.execute(f"IF OBJECT_ID('{TABLE}', 'U') IS NOT NULL AND NOT EXISTS (SELECT * FROM sys.columns "
+                           f"WHERE object_id = OBJECT_ID('{TABLE}') AND name = 'Email') "
+                           f"ALTER TABLE {TABLE} ADD Email NVARCHAR(100) NOT NULL DEFAULT ''")
+            cursor.execute(f"IF OBJECT_ID('{TABLE}', 'U') IS NOT NULL AND NOT EXISTS (SELECT * FROM sys.columns "
+                           f"WHERE object_id = OBJECT_ID('{TABLE}') AND name = 'Designation') "
+                           f"ALTER TABLE {TABLE} ADD Designation NVARCHAR(50) NOT NULL DEFAULT ''")
+        finally:
+            cursor.close()
+        super().init_schema(conn)
+
+    def create_table(self, cursor, name, create_sql):
+        cursor.execute(f"IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{name}' AND xtype='U') {create_sql}")
+
+    def create_index(self, cursor, name, table, columns):
+        cursor.execute(f"IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = '{name}' "
+                       f"AND object_id = OBJECT_ID('{table}')) CREATE INDEX {name} ON {table}({columns})")
+
+    def drop_table(self, cursor, name):
+        cursor.execute(f"IF OBJECT_ID('{name}', 'U') IS NOT NULL DROP TABLE {name}")
+
+    def executemany(self, cursor, sql, rows):
+        cursor.fast_executemany = True
+        cursor.executemany(sql, rows)
+
+    def swap_in(self, cursor, staging, table):
+        # Index names are per table in SQL Server, so the staging table is
+        # indexed before the rename and the swap itself is two renames.
+        for name, columns in INDEXES:
+            cursor.execute(f'CREATE INDEX {name} ON {staging}({columns})')
+        self.drop_table(cursor, OLD_TABLE)
+        cursor.execute(f"EXEC sp_rename '{table}', '{OLD_TABLE}'")
+        cursor.execute(f"EXEC sp_rename '{staging}', '{table}'")
+        cursor.execute(f'DROP TABLE {OLD_TABLE}')
+
+    def select(self, columns, table, where=(), params=(), order_by=None, limit=None):
+        top = ''
+        params = list(params)
+        if limit is not None:
+            top = 'TOP (?) '
+            params.insert(0, limit)
+        sql, params = super().select(columns, table, where, params, order_by)
+        return sql.replace('SELECT ', f'SELECT {top}', 1), params
+
+
+class PostgresBackend(Backend):
+    dialect = 'postgresql'
+    module_name = 'psycopg2'
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+
+    def connect(self):
+        return QmarkConnection(self.module.connect(self.dsn))
+
+    def ddl(self, sql):
+        return sql.replace('NVARCHAR', 'VARCHAR')
+
+    def executemany(self, cursor, sql, rows):
+        from psycopg2.extras import execute_batch
+        execute_batch(cursor.raw, qmark_to_format(sql), rows, page_size=1000)
+
+    def bulk_insert(self, cursor, table, rows):
+        from psycopg2.extras import execute_values
+        execute_values(cursor.raw, f"INSERT INTO {table} ({', '.join(EMPLOYEE_COLUMNS)}) VALUES %s",
+                       rows, page_size=1000)
+
+    def streaming_cursor(self, conn):
+        # A named cursor is server-side: fetchmany pulls one batch at a time.
+        return QmarkCursor(conn.raw.cursor(name=f'stream_{uuid.uuid4().hex}'))
+
+
+class SqliteBackend(Backend):
+    dialect = 'sqlite'
+    module_name = 'sqlite3'
+
+    def __init__(self, path, cached_statements=256, busy_timeout=5000):
+        self.path = path
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+
+    def connect(self):
+        # Pooled connections are handed between request threads, never used
+        # by two threads at once.  Statements are compiled once and reused
+        # from the per-connection cache.
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=self.cached_statements)
+        # WAL lets readers run alongside an import; NORMAL sync is durable
+        # across application crashes, which is all WAL mode needs.
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout)}')
+        return conn
+
+    def ping(self, conn):
+        conn.execute('SELECT 1').fetchone()
+
+    def begin(self, conn, cursor):
+        # sqlite3 only opens a transaction implicitly before DML, so DDL
+        # needs an explicit BEGIN to be rolled back with it.
+        if not conn.in_transaction:
+            cursor.execute('BEGIN')
+
+
+def qmark_to_format(sql):
+    return sql.replace('%', '%%').replace('?', '%s')
+
+
+class QmarkCursor:
+    """psycopg2 cursor that takes the ``?`` placeholders used everywhere else."""
+
+    def __init__(self, cursor):
+        self.raw = cursor
+
+    def execute(self, sql, params=None):
+        return self.raw.execute(qmark_to_format(sql), params)
+
+    def executemany(self, sql, rows):
+        return self.raw.executemany(qmark_to_format(sql), rows)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __iter__(self):
+        return iter(self.raw)
+
+
+class QmarkConnection:
+    def __init__(self, conn):
+        self.raw = conn
+
+    def cursor(self):
+        return QmarkCursor(self.raw.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+def create_backend(config):
+    """Build the backend named by ``config['backend']`` from the app's DB_CONFIG."""
+    name = config['backend']
+    if name == 'sqlite':
+        return SqliteBackend(config['sqlite_path'])
+    if name == 'postgresql':
+        return PostgresBackend(config['postgres_dsn'])
+    if name == 'mssql':
+        return SqlServerBackend(config['server'], config['database'], config['driver'], config['trusted_connection'])
+    raise ValueError(f"Unknown DB_BACKEND '{name}', expected one of: {', '.join(BACKENDS)}")
+
+
+def _benchmark(backend, rows=200_000, batch_size=5000):
+    """Time the shared primitives against one backend on a scratch copy of the schema."""
+    from bulk_loader import BulkLoader
+
+    data = [(i, f'Employee {i:07d}', f'employee{i}@example.com', f'Dept {i % 25}', f'Designation {i % 40}')
+            for i in range(1, rows + 1)]
+    conn = backend.connect()
+    try:
+        backend.init_schema(conn)
+
+        started = time.perf_counter()
+        BulkLoader(conn, backend, batch_size=batch_size, mode='swap').load(data)
+        print(f"  bulk load (swap):        {time.perf_counter() - started:8.3f}s")
+
+        cursor = conn.cursor()
+        started = time.perf_counter()
+        pages, after = 0, None
+        while pages < 200:
+            where, params = [], []
+            if after:
+                where.append('(Name > ? OR (Name = ? AND ID > ?))')
+                params.extend([after[0], after[0], after[1]])
+            cursor.execute(*backend.select(['ID', 'Name', 'Email'], TABLE, where, params, ['Name', 'ID'], 100))
+            page = cursor.fetchall()
+            if not page:
+                break
+            after = (page[-1][1], page[-1][0])
+            pages += 1
+        print(f"  keyset page of 100:      {(time.perf_counter() - started) / max(pages, 1) * 1000:8.3f}ms")
+
+        started = time.perf_counter()
+        for i in range(50):
+            cursor.execute(*backend.select(['ID', 'Name'], TABLE, ['Department = ?'], [f'Dept {i % 25}'],
+                                           ['Name', 'ID'], 100))
+            cursor.fetchall()
+        print(f"  department page of 100:  {(time.perf_counter() - started) / 50 * 1000:8.3f}ms")
+
+        started = time.perf_counter()
+        for _ in range(10):
+            cursor.execute(f'SELECT Department, Designation, COUNT(*) FROM {TABLE} GROUP BY Department, Designation')
+            cursor.fetchall()
+        print(f"  GROUP BY aggregate:      {(time.perf_counter() - started) / 10 * 1000:8.3f}ms")
+
+        started = time.perf_counter()
+        for _ in range(50):
+            cursor.execute(f'SELECT Department, Headcount FROM {DEPARTMENT_STATS_TABLE}')
+            cursor.fetchall()
+        print(f"  department summary read: {(time.perf_counter() - started) / 50 * 1000:8.3f}ms")
+
+        started = time.perf_counter()
+        stream = backend.streaming_cursor(conn)
+        stream.execute(f'SELECT ID, Name, Email, Department, Designation FROM {TABLE}')
+        streamed = 0
+        while True:
+            batch = stream.fetchmany(batch_size)
+            if not batch:
+                break
+            streamed += len(batch)
+        stream.close()
+        print(f"  stream full table:       {time.perf_counter() - started:8.3f}s ({streamed} rows)")
+        cursor.close()
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    # python backends.py [rows]; set DB_BACKEND (and the matching DB_* settings)
+    # to benchmark SQL Server or PostgreSQL, otherwise a scratch SQLite file.
+    import os
+    import sys
+    import tempfile
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as tmp:
+        config = {
+            'backend': os.getenv('DB_BACKEND', 'sqlite'),
+            'sqlite_path': os.path.join(tmp, 'bench.db'),
+            'postgres_dsn': os.getenv('DB_POSTGRES_DSN', 'dbname=employeedb'),
+            'server': os.getenv('DB_SERVER', 'localhost'),
+            'database': os.getenv('DB_NAME', 'EmployeeDB'),
+            'driver': os.getenv('DB_DRIVER', '{ODBC Driver 17 for SQL Server}'),
+            'trusted_connection': os.getenv('DB_TRUSTED_CONNECTION', 'yes'),
+        }
+        backend = create_backend(config)
+        print(f"{backend.dialect}, {rows} rows")
+        backend.create_database()
+        _benchmark(backend, rows)
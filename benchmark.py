@@ -0,0 +1,347 @@
+"""Repeatable load scenarios for the API and the import pipeline.
+
+    python benchmark.py --rows 100000 --skew 1.1
+    python benchmark.py --rows 1000000 --scenarios department_filter,departments_concurrent
+    python benchmark.py --rows 100000 --compare benchmarks/20250101-120000.json
+
+The app runs in-process behind Flask's test client, in a scratch working
+directory against a scratch SQLite database (``--configured-db`` uses the
+DB_BACKEND settings from the environment instead, and replaces its roster).
+The roster comes from ``generate_employees.generate_rows`` and is loaded with
+the BulkLoader before the read scenarios run.  The result and response
+caches are off unless ``--cache`` is given; ``--no-snapshot`` turns the columnar employee
+snapshot off as well, so the listing scenarios measure the database path.
+
+Every scenario reports throughput, p50/p99 latency and the peak RSS of the
+process while it ran.  Results are written as JSON under ``benchmarks/``;
+``--compare`` prints the change against an earlier run and exits with
+status 1 when a scenario got slower than ``--tolerance`` allows.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ('upload', 'department_filter', 'full_listing', 'departments_concurrent')
+
+
+class RssSampler:
+    """Track the peak resident set size of this process while running."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+
+def current_rss():
+    """Resident set size in bytes (Linux), else the process-wide peak RSS, else 0."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile.
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+
+def summarize(latencies, seconds, peak_rss, errors=0, **extra):
+    latencies = sorted(latencies)
+    result = {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(seconds, 3),
+        'throughput': round(len(latencies) / seconds, 2) if seconds else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+        'peak_rss_mb': round(peak_rss / 2 ** 20, 1),
+    }
+    result.update(extra)
+    return result
+
+
+class Bench:
+    def __init__(self, appmod, args):
+        self.appmod = appmod
+        self.app = appmod.app
+        self.args = args
+        self.headers = {'Accept-Encoding': args.accept_encoding} if args.accept_encoding else {}
+        self.departments = []
+
+    def client(self):
+        client = self.app.test_client()
+        response = client.post('/login', data={'username': self.appmod.ADMIN_USERNAME,
+                                               'password': self.appmod.ADMIN_PASSWORD})
+        if response.status_code != 302:
+            raise RuntimeError(f'Login failed with status {response.status_code}')
+        return client
+
+    def seed(self):
+        from bulk_loader import BulkLoader
+        from generate_employees import generate_rows
+
+        started = time.perf_counter()
+        with self.appmod.db_pool.connection() as conn:
+            BulkLoader(conn, self.appmod.db_backend, mode='swap').load(
+                generate_rows(self.args.rows, skew=self.args.skew, seed=self.args.seed))
+        self.appmod.dataset_generation.bump()
+        with self.appmod.db_pool.connection() as conn:
+            self.appmod.refresh_snapshot(conn)
+        self.departments = self.client().get('/api/departments').get_json()['departments']
+        print(f"Seeded {self.args.rows} employees in {len(self.departments)} departments "
+              f"in {time.perf_counter() - started:.1f}s")
+
+    def timed_gets(self, client, urls):
+        latencies, errors, size = [], 0, 0
+        for url in urls:
+            started = time.perf_counter()
+            response = client.get(url, headers=self.headers)
+            body = response.get_data()
+            latencies.append(time.perf_counter() - started)
+            response.close()
+            size += len(body)
+            if response.status_code != 200:
+                errors += 1
+        return latencies, errors, size
+
+    def upload(self):
+        from generate_employees import MAX_XLSX_ROWS, generate_rows, write_workbook
+
+        rows = min(self.args.rows, MAX_XLSX_ROWS)
+        # A different roster per repeat: the blob store skips a workbook it
+        # has already imported, which would leave nothing to measure.
+        workbooks = []
+        for repeat in range(self.args.upload_repeats):
+            buffer = io.BytesIO()
+            write_workbook(buffer, generate_rows(rows, skew=self.args.skew, seed=self.args.seed + repeat + 1))
+            workbooks.append(buffer.getvalue())
+        client = self.client()
+        latencies, errors, job = [], 0, {}
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            for workbook in workbooks:
+                began = time.perf_counter()
+                response = client.post('/dashboard/upload', data={'file': (io.BytesIO(workbook), 'bench.xlsx')},
+                                       content_type='multipart/form-data')
+                location = response.headers.get('Location', '')
+                if 'job=' not in location:
+                    errors += 1
+                    print(f"  upload was not queued: {response.status_code} {location}")
+                    continue
+                job_id = location.split('job=')[1]
+                while True:
+                    job = client.get(f'/api/imports/{job_id}').get_json()
+                    if job['status'] in ('succeeded', 'failed'):
+                        break
+                    time.sleep(0.02)
+                latencies.append(time.perf_counter() - began)
+                if job['status'] != 'succeeded':
+                    errors += 1
+                    print(f"  upload failed: {job['error']}")
+            seconds = time.perf_counter() - started
+        phases = (job.get('result') or {}).get('phases')
+        return summarize(latencies, seconds, rss.peak, errors, rows=rows,
+                         rows_per_second=round(rows * len(latencies) / seconds, 1), last_phases=phases)
+
+    def department_filter(self):
+        # The employer page's request: one department, ID/Name/Department only.
+        urls = [f'/api/employees?department={quote(self.departments[i % len(self.departments)])}&employer=true'
+                for i in range(self.args.requests)]
+        client = self.client()
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            latencies, errors, size = self.timed_gets(client, urls)
+            seconds = time.perf_counter() - started
+        return summarize(latencies, seconds, rss.peak, errors, mean_response_bytes=size // max(1, len(urls)))
+
+    def full_listing(self):
+        urls = ['/api/employees'] * self.args.listing_requests
+        client = self.client()
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            latencies, errors, size = self.timed_gets(client, urls)
+            seconds = time.perf_counter() - started
+        return summarize(latencies, seconds, rss.peak, errors, mean_response_bytes=size // max(1, len(urls)),
+                         rows_per_second=round(self.args.rows * len(urls) / seconds, 1))
+
+    def departments_concurrent(self):
+        # Many users opening the department dropdown at once.
+        clients = [self.client() for _ in range(self.args.threads)]
+        per_thread = max(1, self.args.requests // self.args.threads)
+        results = [None] * len(clients)
+        barrier = threading.Barrier(len(clients) + 1)
+
+        def worker(index):
+            barrier.wait()
+            results[index] = self.timed_gets(clients[index], ['/api/departments'] * per_thread)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(clients))]
+        for thread in threads:
+            thread.start()
+        with RssSampler() as rss:
+            barrier.wait()
+            started = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            seconds = time.perf_counter() - started
+        latencies = [latency for result in results for latency in result[0]]
+        errors = sum(result[1] for result in results)
+        return summarize(latencies, seconds, rss.peak, errors, threads=self.args.threads)
+
+
+def compare(current, previous, tolerance):
+    """Print the change per scenario; returns the names that regressed."""
+    regressed = []
+    for setting in ('backend', 'rows', 'skew', 'cache', 'snapshot', 'accept_encoding'):
+        if previous.get(setting) != current[setting]:
+            print(f"  note: {setting} differs ({previous.get(setting)} -> {current[setting]}), numbers are not comparable")
+    for name, result in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        changes = []
+        worse = False
+        # (metric, True when a higher value is worse)
+        for metric, higher_is_worse in (('p50_ms', True), ('p99_ms', True), ('throughput', False)):
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            changes.append(f'{metric} {old:g} -> {new:g} ({change:+.0%})')
+            if (change if higher_is_worse else -change) > tolerance:
+                worse = True
+        print(f"  {name:<24}{'REGRESSED  ' if worse else ''}{', '.join(changes)}")
+        if worse:
+            regressed.append(name)
+    return regressed
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the employee API and import pipeline.')
+    parser.add_argument('--rows', type=int, default=100_000, help='roster size (1k to 5M)')
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent for department sizes, 0 = even')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"comma separated: {', '.join(SCENARIOS)}")
+    parser.add_argument('--requests', type=int, default=200, help='requests per read scenario')
+    parser.add_argument('--listing-requests', type=int, default=5, help='requests for full_listing')
+    parser.add_argument('--upload-repeats', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=16, help='clients for departments_concurrent')
+    parser.add_argument('--cache', action='store_true', help='keep the result and response caches on')
+    parser.add_argument('--no-snapshot', action='store_true', help='serve /api/employees from the database')
+    parser.add_argument('--accept-encoding', help="Accept-Encoding sent by the read scenarios, e.g. 'gzip, br'")
+    parser.add_argument('--configured-db', action='store_true',
+                        help='use DB_BACKEND from the environment instead of a scratch SQLite file (replaces its roster)')
+    parser.add_argument('--output', help='result file (default: benchmarks/<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown before a regression, 0.2 = 20%%')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+    output = os.path.abspath(args.output or os.path.join(
+        ROOT, 'benchmarks', f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Uploads, job state and the scratch database all live in workdir.
+        if not args.configured_db:
+            os.environ['DB_BACKEND'] = 'sqlite'
+            os.environ['DB_SQLITE_PATH'] = os.path.join(workdir, 'bench.db')
+        if not args.cache:
+            os.environ['RESULT_CACHE_SIZE'] = '0'
+            os.environ['RESPONSE_CACHE_SIZE'] = '0'
+        if args.no_snapshot:
+            os.environ['SNAPSHOT_ENABLED'] = 'false'
+        os.chdir(workdir)
+        sys.path.insert(0, ROOT)
+        import app as appmod
+
+        appmod.app.config['WTF_CSRF_ENABLED'] = False
+        appmod.init_db()
+        bench = Bench(appmod, args)
+        bench.seed()
+
+        results = {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': appmod.db_backend.dialect,
+            'rows': args.rows,
+            'skew': args.skew,
+            'seed': args.seed,
+            'cache': args.cache,
+            'snapshot': not args.no_snapshot,
+            'accept_encoding': args.accept_encoding,
+            'scenarios': {},
+        }
+        for name in scenarios:
+            result = getattr(bench, name)()
+            results['scenarios'][name] = result
+            print(f"{name:<24}{result['throughput']:>10} req/s  p50 {result['p50_ms']}ms  "
+                  f"p99 {result['p99_ms']}ms  peak RSS {result['peak_rss_mb']}MB")
+        appmod.import_jobs.shutdown()
+        appmod.db_pool.close()
+        os.chdir(ROOT)
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print(f"Compared with {args.compare} (commit {previous.get('commit')}):")
+        if compare(results, previous, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
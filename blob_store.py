@@ -0,0 +1,234 @@
+"""Content-addressed storage for uploaded workbooks.
+
+Each upload is stored once under its SHA-256 digest
+(``<root>/sha256/ab/abcdef....xlsx``), however many times it is uploaded.
+A small SQLite index next to the blobs records, per digest, the original
+file name, size, upload times and count, the row count and the outcome of
+the last import, including the dataset generation that import produced.
+An upload whose digest was the last thing imported at the current
+generation is identical to the live roster and can be skipped outright.
+
+``compact`` applies the retention policy (keep the newest blobs, drop old
+ones) and removes files and index rows that no longer match; ``start_compaction``
+runs it periodically on a daemon thread.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+CHUNK_SIZE = 1024 * 1024
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+INDEX_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS blobs (
+        sha256 TEXT PRIMARY KEY,
+        filename TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        first_uploaded_at REAL NOT NULL,
+        last_uploaded_at REAL NOT NULL,
+        upload_count INTEGER NOT NULL DEFAULT 1,
+        row_count INTEGER,
+        last_job_id TEXT,
+        last_import_at REAL,
+        last_import_status TEXT,
+        last_import_result TEXT,
+        imported_generation INTEGER
+    )
+'''
+
+COLUMNS = ('sha256', 'filename', 'size', 'first_uploaded_at', 'last_uploaded_at', 'upload_count', 'row_count',
+           'last_job_id', 'last_import_at', 'last_import_status', 'last_import_result', 'imported_generation')
+
+
+class BlobStore:
+    def __init__(self, root, extension='.xlsx'):
+        self.root = root
+        self.extension = extension
+        self.index_path = os.path.join(root, 'index.db')
+        os.makedirs(os.path.join(root, 'sha256'), exist_ok=True)
+        with self._index() as db:
+            db.execute(INDEX_SCHEMA)
+        self._compactor = None
+
+    def path(self, digest):
+        return os.path.join(self.root, 'sha256', digest[:2], digest + self.extension)
+
+    def put(self, stream, filename):
+        """Store the contents of ``stream``; returns ``(digest, created)``.
+
+        The data is hashed while it is written to a temporary file, which is
+        then renamed into place, or discarded when the blob already exists.
+        """
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            digest = sha.hexdigest()
+            path = self.path(digest)
+            now = time.time()
+            with self._index(exclusive=True) as db:
+                created = not os.path.exists(path)
+                if created:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                db.execute('INSERT INTO blobs (sha256, filename, size, first_uploaded_at, last_uploaded_at) '
+                           'VALUES (?, ?, ?, ?, ?) ON CONFLICT (sha256) DO UPDATE SET '
+                           'filename = excluded.filename, last_uploaded_at = excluded.last_uploaded_at, '
+                           'upload_count = upload_count + 1',
+                           (digest, filename, size, now, now))
+        finally:
+            self._remove_file(tmp_path)
+        logging.info(f"Stored upload {filename} as blob {digest} ({'new' if created else 'duplicate'}, {size} bytes)")
+        return digest, created
+
+    def get(self, digest):
+        with self._index() as db:
+            row = db.execute(f"SELECT {', '.join(COLUMNS)} FROM blobs WHERE sha256 = ?", (digest,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, limit=50):
+        """Metadata of the most recently uploaded blobs, newest first."""
+        with self._index() as db:
+            rows = db.execute(f"SELECT {', '.join(COLUMNS)} FROM blobs ORDER BY last_uploaded_at DESC LIMIT ?",
+                              (limit,)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def record_job(self, digest, job_id):
+        with self._index() as db:
+            db.execute('UPDATE blobs SET last_job_id = ? WHERE sha256 = ?', (job_id, digest))
+
+    def record_import(self, digest, status, result=None, generation=None):
+        """Record an import of ``digest``; ``generation`` is the dataset generation it left live.
+
+        A failed import (no ``generation``) leaves the recorded generation
+        alone: whatever the blob last made live is unchanged.
+        """
+        row_count = result.get('rows_loaded') if result else None
+        with self._index() as db:
+            db.execute('UPDATE blobs SET last_import_at = ?, last_import_status = ?, last_import_result = ?, '
+                       'imported_generation = COALESCE(?, imported_generation), row_count = COALESCE(?, row_count) '
+                       'WHERE sha256 = ?',
+                       (time.time(), status, json.dumps(result) if result is not None else None, generation,
+                        row_count, digest))
+
+    def record_row_count(self, digest, row_count):
+        with self._index() as db:
+            db.execute('UPDATE blobs SET row_count = ? WHERE sha256 = ?', (row_count, digest))
+
+    def live_digest(self, generation):
+        """The blob whose import produced ``generation`` (the live roster), if any."""
+        with self._index() as db:
+            row = db.execute('SELECT sha256 FROM blobs WHERE imported_generation = ? '
+                             'ORDER BY last_import_at DESC LIMIT 1', (generation,)).fetchone()
+        return row[0] if row else None
+
+    def compact(self, keep=20, max_age_days=90, protect=()):
+        """Apply retention and remove stray files; returns what was removed.
+
+        The ``keep`` most recently uploaded blobs are kept regardless of age;
+        older ones are dropped once they were last uploaded more than
+        ``max_age_days`` ago.  Digests in ``protect`` (the live roster,
+        blobs with pending jobs) are never removed.
+        """
+        now = time.time()
+        cutoff = now - max_age_days * 86400
+        strays = 0
+        # The write lock keeps put() from storing a blob while it is deleted.
+        with self._index(exclusive=True) as db:
+            expired = [row[0] for row in db.execute(
+                'SELECT sha256 FROM (SELECT sha256, last_uploaded_at FROM blobs '
+                'ORDER BY last_uploaded_at DESC LIMIT -1 OFFSET ?) WHERE last_uploaded_at < ?', (keep, cutoff))
+                if row[0] not in protect]
+            for digest in expired:
+                self._remove_file(self.path(digest))
+            known = {row[0] for row in db.execute('SELECT sha256 FROM blobs')}
+            missing = [digest for digest in known.difference(expired) if not os.path.exists(self.path(digest))]
+            db.executemany('DELETE FROM blobs WHERE sha256 = ?', [(digest,) for digest in expired + missing])
+
+            # Files the index does not know about, and temporaries left behind
+            # by an interrupted upload.
+            for dirpath, _, filenames in os.walk(os.path.join(self.root, 'sha256')):
+                for name in filenames:
+                    if name.endswith(self.extension) and name[:-len(self.extension)] in known:
+                        continue
+                    self._remove_file(os.path.join(dirpath, name))
+                    strays += 1
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if name.endswith('.tmp') and now - os.path.getmtime(path) > 3600:
+                    self._remove_file(path)
+                    strays += 1
+
+        if expired or missing:
+            with self._index() as db:
+                db.execute('VACUUM')
+        removed = {'expired': len(expired), 'missing': len(missing), 'stray_files': strays}
+        if any(removed.values()):
+            logging.info(f"Blob store compaction: {removed}")
+        return removed
+
+    def start_compaction(self, interval, protect=lambda: (), **retention):
+        """Run ``compact`` every ``interval`` seconds on a daemon thread.
+
+        ``protect`` is called before each run and returns the digests to keep.
+        """
+        if self._compactor is not None or interval <= 0:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.compact(protect=set(protect()), **retention)
+                except Exception as e:
+                    logging.error(f"Blob store compaction error: {e}")
+                time.sleep(interval)
+
+        self._compactor = threading.Thread(target=run, name='blob-compaction', daemon=True)
+        self._compactor.start()
+
+    @contextmanager
+    def _index(self, exclusive=False):
+        # One short-lived connection per operation: the index is shared by
+        # every thread and worker process.  ``exclusive`` takes the write lock
+        # up front, serializing the block against every other writer.
+        db = sqlite3.connect(self.index_path, timeout=30)
+        try:
+            with db:
+                if exclusive:
+                    db.execute('BEGIN IMMEDIATE')
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _to_dict(row):
+        blob = dict(zip(COLUMNS, row))
+        if blob['last_import_result']:
+            blob['last_import_result'] = json.loads(blob['last_import_result'])
+        return blob
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def is_digest(value):
+    return bool(DIGEST_PATTERN.match(value or ''))
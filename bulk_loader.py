@@ -0,0 +1,296 @@
+"""Bulk ingestion for the employees table.
+
+Rows are sent to the database as parameter arrays (``executemany``) in
+fixed-size batches instead of one INSERT round trip per employee.  Three load
+modes are supported:
+
+* ``replace`` - ``DELETE FROM employees`` and reload inside one transaction.
+* ``swap``    - load into a staging table (committing every batch), build the
+  index once, then swap the staging table in with a rename.  Readers keep
+  seeing the old roster until the rename commits.
+* ``merge``   - compare the upload with the live table by ``ID`` using a
+  digest of each row and apply only the inserts, updates and deletes, in
+  one transaction.  With ``dry_run`` the changes are only counted, which is
+  how a stored upload is diffed against the live table.
+
+Every mode also recomputes the department summary tables (headcount per
+department and per designation) in the transaction that publishes the new
+roster, so the summary never disagrees with ``employees``.
+
+Engine-specific statements (fast bulk inserts, the table swap, dropping a
+table if it exists) come from the connection's backend in ``backends.py``.
+"""
+import hashlib
+import logging
+import time
+from itertools import islice
+
+EMPLOYEE_COLUMNS = ('ID', 'Name', 'Email', 'Department', 'Designation')
+
+LOAD_MODES = ('replace', 'swap', 'merge')
+
+TABLE = 'employees'
+STAGING_TABLE = 'employees_staging'
+OLD_TABLE = 'employees_old'
+
+CREATE_TABLE_SQL = '''
+    CREATE TABLE {table} (
+        ID INT PRIMARY KEY,
+        Name NVARCHAR(100) NOT NULL,
+        Email NVARCHAR(100) NOT NULL,
+        Department NVARCHAR(50) NOT NULL,
+        Designation NVARCHAR(50) NOT NULL
+    )
+'''
+
+# Secondary indexes as (name, columns).  The composite indexes back the
+# keyset pagination on (Name, ID) used by /api/employees.
+INDEXES = (
+    ('IX_employees_Department', 'Department'),
+    ('IX_employees_Department_Name', 'Department, Name, ID'),
+    ('IX_employees_Name', 'Name, ID'),
+)
+
+# Materialized department summary, rebuilt by every load.
+DEPARTMENT_STATS_TABLE = 'department_stats'
+DESIGNATION_STATS_TABLE = 'department_designation_stats'
+
+STATS_TABLES = {
+    DEPARTMENT_STATS_TABLE: '''
+    CREATE TABLE department_stats (
+        Department NVARCHAR(50) PRIMARY KEY,
+        Headcount INT NOT NULL
+    )
+''',
+    DESIGNATION_STATS_TABLE: '''
+    CREATE TABLE department_designation_stats (
+        Department NVARCHAR(50) NOT NULL,
+        Designation NVARCHAR(50) NOT NULL,
+        Headcount INT NOT NULL,
+        PRIMARY KEY (Department, Designation)
+    )
+''',
+}
+
+INSERT_SQL = 'INSERT INTO {table} (ID, Name, Email, Department, Designation) VALUES (?, ?, ?, ?, ?)'
+UPDATE_SQL = 'UPDATE employees SET Name = ?, Email = ?, Department = ?, Designation = ? WHERE ID = ?'
+DELETE_SQL = 'DELETE FROM employees WHERE ID = ?'
+
+DEFAULT_BATCH_SIZE = 5000
+DIFF_SAMPLE_SIZE = 20
+
+
+def row_digest(row):
+    """Digest of an employee row's non-key columns, used to detect changes."""
+    return hashlib.blake2b('\x1f'.join(str(value) for value in row[1:]).encode(), digest_size=16).digest()
+
+
+def refresh_department_stats(cursor):
+    """Recompute the department summary tables from ``employees``.
+
+    Runs in the caller's transaction; the caller commits.
+    """
+    cursor.execute(f'DELETE FROM {DEPARTMENT_STATS_TABLE}')
+    cursor.execute(f'DELETE FROM {DESIGNATION_STATS_TABLE}')
+    cursor.execute(f'INSERT INTO {DEPARTMENT_STATS_TABLE} (Department, Headcount) '
+                   f'SELECT Department, COUNT(*) FROM {TABLE} GROUP BY Department')
+    cursor.execute(f'INSERT INTO {DESIGNATION_STATS_TABLE} (Department, Designation, Headcount) '
+                   f'SELECT Department, Designation, COUNT(*) FROM {TABLE} GROUP BY Department, Designation')
+
+
+def batched(rows, size):
+    """Yield lists of at most ``size`` items from ``rows``."""
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class BulkLoader:
+    def __init__(self, conn, backend, batch_size=DEFAULT_BATCH_SIZE, mode='swap', dry_run=False):
+        if mode not in LOAD_MODES:
+            raise ValueError(f"Unknown load mode '{mode}', expected one of: {', '.join(LOAD_MODES)}")
+        if dry_run and mode != 'merge':
+            raise ValueError('dry_run is only supported in merge mode')
+        self.conn = conn
+        self.backend = backend
+        self.batch_size = max(1, int(batch_size))
+        self.mode = mode
+        self.dry_run = dry_run
+
+    def load(self, rows):
+        """Load an iterable of (ID, Name, Email, Department, Designation) tuples.
+
+        Returns a dict with ``rows_loaded`` (rows in the upload) and, in merge
+        mode, the ``inserted``/``updated``/``deleted``/``unchanged`` counts;
+        a dry run adds ``samples``, the first few IDs of each kind of change.
+        On failure the transaction is rolled back, the staging table is
+        dropped and the live table is left untouched.
+        """
+        return self.load_batches(batched(rows, self.batch_size))
+
+    def load_batches(self, batches):
+        started = time.perf_counter()
+        cursor = self.conn.cursor()
+        try:
+            if self.mode == 'swap':
+                result = {'rows_loaded': self._load_swap(cursor, batches)}
+            elif self.mode == 'merge':
+                result = self._load_merge(cursor, batches)
+            else:
+                result = {'rows_loaded': self._load_replace(cursor, batches)}
+        except Exception:
+            self.conn.rollback()
+            if self.mode == 'swap':
+                self._drop_staging(cursor)
+            raise
+        finally:
+            cursor.close()
+        action = 'Compared' if self.dry_run else 'Bulk loaded'
+        logging.info(f"{action} {result['rows_loaded']} employees in {time.perf_counter() - started:.2f}s "
+                     f"(mode={self.mode}, batch_size={self.batch_size}): {result}")
+        return result
+
+    def _insert(self, cursor, table, batches, commit_each_batch):
+        count = 0
+        for batch in batches:
+            if not batch:
+                continue
+            self.backend.bulk_insert(cursor, table, batch)
+            count += len(batch)
+            if commit_each_batch:
+                self.conn.commit()
+        return count
+
+    def _load_replace(self, cursor, batches):
+        self.backend.begin(self.conn, cursor)
+        cursor.execute(f'DELETE FROM {TABLE}')
+        count = self._insert(cursor, TABLE, batches, commit_each_batch=False)
+        refresh_department_stats(cursor)
+        self.conn.commit()
+        return count
+
+    def _load_swap(self, cursor, batches):
+        self._drop_staging(cursor)
+        cursor.execute(self.backend.ddl(CREATE_TABLE_SQL.format(table=STAGING_TABLE)))
+        self.conn.commit()
+
+        count = self._insert(cursor, STAGING_TABLE, batches, commit_each_batch=True)
+
+        # Indexes are built once over the loaded heap rather than being
+        # maintained row by row during the load.
+        self.backend.begin(self.conn, cursor)
+        self.backend.swap_in(cursor, STAGING_TABLE, TABLE)
+        refresh_department_stats(cursor)
+        self.conn.commit()
+        return count
+
+    def _load_merge(self, cursor, batches):
+        self.backend.begin(self.conn, cursor)
+        cursor.execute(f'SELECT ID, Name, Email, Department, Designation FROM {TABLE}')
+        current = {}
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            for row in rows:
+                current[row[0]] = row_digest(row)
+
+        result = {'rows_loaded': 0, 'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        samples = {'inserted': [], 'updated': [], 'deleted': []}
+        for batch in batches:
+            inserts = []
+            updates = []
+            for row in batch:
+                digest = current.pop(row[0], None)
+                if digest is None:
+                    inserts.append(row)
+                elif digest != row_digest(row):
+                    updates.append((row[1], row[2], row[3], row[4], row[0]))
+            if self.dry_run:
+                self._sample(samples['inserted'], (row[0] for row in inserts))
+                self._sample(samples['updated'], (row[4] for row in updates))
+            else:
+                if inserts:
+                    self.backend.bulk_insert(cursor, TABLE, inserts)
+                if updates:
+                    self.backend.executemany(cursor, UPDATE_SQL, updates)
+            result['rows_loaded'] += len(batch)
+            result['inserted'] += len(inserts)
+            result['updated'] += len(updates)
+            result['unchanged'] += len(batch) - len(inserts) - len(updates)
+
+        # Whatever is left in ``current`` was not in the upload.
+        if self.dry_run:
+            result['deleted'] = len(current)
+            self._sample(samples['deleted'], current)
+            result['samples'] = samples
+            self.conn.rollback()
+            return result
+        for ids in batched(((emp_id,) for emp_id in current), self.batch_size):
+            self.backend.executemany(cursor, DELETE_SQL, ids)
+            result['deleted'] += len(ids)
+        if result['inserted'] or result['updated'] or result['deleted']:
+            refresh_department_stats(cursor)
+        self.conn.commit()
+        return result
+
+    @staticmethod
+    def _sample(sample, ids):
+        if len(sample) < DIFF_SAMPLE_SIZE:
+            sample.extend(islice(ids, DIFF_SAMPLE_SIZE - len(sample)))
+
+    def _drop_staging(self, cursor):
+        try:
+            self.backend.drop_table(cursor, STAGING_TABLE)
+            self.conn.commit()
+        except Exception as e:
+            logging.error(f"Could not drop staging table: {e}")
+
+
+def _benchmark(rows=200_000, batch_size=DEFAULT_BATCH_SIZE):
+    """Compare row-by-row inserts with the bulk loader on a local SQLite file."""
+    import os
+    import tempfile
+
+    from backends import SqliteBackend
+
+    data = [(i, f'Employee {i}', f'employee{i}@example.com', f'Dept {i % 25}', f'Designation {i % 40}')
+            for i in range(1, rows + 1)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SqliteBackend(os.path.join(tmp, 'bench.db'))
+        conn = backend.connect()
+        backend.init_schema(conn)
+
+        started = time.perf_counter()
+        cursor = conn.cursor()
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for row in data:
+            cursor.execute(INSERT_SQL.format(table=TABLE), row)
+        conn.commit()
+        print(f"row-by-row:    {time.perf_counter() - started:.2f}s")
+
+        for mode in LOAD_MODES:
+            started = time.perf_counter()
+            BulkLoader(conn, backend, batch_size=batch_size, mode=mode).load(data)
+            print(f"bulk {mode + ':':<9}{time.perf_counter() - started:.2f}s")
+
+        # A re-upload with 10 changed rows only touches those rows in merge mode.
+        changed = list(data)
+        for i in range(10):
+            emp_id, name, email, department, designation = changed[i]
+            changed[i] = (emp_id, name + ' Jr', email, department, designation)
+        started = time.perf_counter()
+        result = BulkLoader(conn, backend, batch_size=batch_size, mode='merge').load(changed)
+        print(f"merge, 10 changed rows: {time.perf_counter() - started:.2f}s {result}")
+
+        assert conn.execute(f'SELECT COUNT(*) FROM {TABLE}').fetchone()[0] == rows
+        conn.close()
+
+
+if __name__ == '__main__':
+    import sys
+    _benchmark(rows=int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,256 @@
+"""In-process read cache for the employee API.
+
+Cached results are tagged with the dataset generation, a counter that is
+bumped every time an upload commits.  The counter lives in a small file so
+every worker process sees the same value; entries from an older generation
+are dropped as soon as a newer one is observed.
+
+``ResponseCache`` keeps finished response bodies rather than query results:
+the JSON bytes plus the gzip (and, with the ``brotli`` package, brotli)
+copies clients have asked for, so a hit is a lookup and a write.
+"""
+import gzip
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from json.encoder import encode_basestring_ascii
+
+try:
+    import fcntl
+except ImportError:  # Windows, where only the single-process dev server runs
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed.
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSORS = {'gzip': lambda body: gzip.compress(body, GZIP_LEVEL, mtime=0)}
+if brotli is not None:
+    COMPRESSORS['br'] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+# Server preference when the client accepts several equally.
+ENCODINGS = tuple(encoding for encoding in ('br', 'gzip') if encoding in COMPRESSORS)
+
+
+class DatasetGeneration:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._value = 0
+
+    def current(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return 0
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp != self._stamp:
+            try:
+                value = self._read()
+            except (OSError, ValueError):
+                return self._value
+            self._stamp, self._value = stamp, value
+        return self._value
+
+    def bump(self):
+        """Increment the generation, serialized across threads and worker processes."""
+        with self._lock, self._file_lock():
+            try:
+                value = self._read() + 1
+            except FileNotFoundError:
+                value = 1
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(str(value))
+            os.replace(tmp_path, self.path)
+            return value
+
+    def _read(self):
+        with open(self.path) as f:
+            return int(f.read().strip() or 0)
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f'{self.path}.lock', 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class ResultCache:
+    """LRU cache with a TTL whose entries are valid for one dataset generation."""
+
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, generation):
+        with self._lock:
+            self._sync(generation)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, generation, value):
+        with self._lock:
+            self._sync(generation)
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _sync(self, generation):
+        if self._generation is None or generation > self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+
+class ResponseCache(ResultCache):
+    """ResultCache of encoded bodies: ``{content-encoding or 'identity': bytes}``.
+
+    An entry holds the body and the encodings its requests have asked for so
+    far; a miss only compresses what the client accepts, and a hit compresses
+    an encoding the entry is missing once.  Besides ``maxsize`` entries, the
+    cache holds at most ``max_bytes`` of bodies (all encodings counted);
+    least recently used entries go first.
+    """
+
+    def __init__(self, maxsize=256, ttl=300, max_bytes=64 * 1024 * 1024):
+        super().__init__(maxsize, ttl)
+        self.max_bytes = max_bytes
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(_size(variants) for _, variants in self._entries.values())
+
+    def get(self, key, generation, encoding=None):
+        """Cached variants, including ``encoding`` when the body is worth compressing."""
+        variants = super().get(key, generation)
+        if variants is not None and lacks_encoding(variants, encoding):
+            variants = self.add_encoding(key, generation, variants, encoding)
+        return variants
+
+    def add_encoding(self, key, generation, variants, encoding):
+        """Compress the cached ``variants`` of ``key`` with ``encoding`` and keep the copy."""
+        variants = dict(variants)
+        variants[encoding] = COMPRESSORS[encoding](variants['identity'])
+        self._store(key, generation, variants)
+        return variants
+
+    def set(self, key, generation, body, encoding=None):
+        """Cache ``body``, compressed with ``encoding`` if given; returns the variants either way."""
+        variants = encode_variants(body, (encoding,) if encoding else ())
+        self._store(key, generation, variants)
+        return variants
+
+    def warm(self, key, generation, body):
+        """Cache ``body`` with every encoding, ahead of any request for it."""
+        self._store(key, generation, encode_variants(body))
+
+    def _store(self, key, generation, variants):
+        size = _size(variants)
+        with self._lock:
+            self._sync(generation)
+            if generation != self._generation or size > self.max_bytes:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, variants)
+            self._entries.move_to_end(key)
+            total = sum(_size(cached) for _, cached in self._entries.values())
+            while len(self._entries) > self.maxsize or total > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                total -= _size(evicted)
+
+
+def _size(variants):
+    return sum(len(body) for body in variants.values())
+
+
+# Bytes orjson writes as they are but json.dumps escapes: DEL and UTF-8.
+_UNESCAPED = re.compile(rb'[\x7f-\xff]+')
+
+
+def encode_json(value):
+    """Compact, ASCII-only JSON with sorted keys as bytes, using orjson when it is installed.
+
+    The bytes are the same either way, and the same as the snapshot's.
+    """
+    if orjson is None:
+        return json.dumps(value, separators=(',', ':'), sort_keys=True).encode()
+    body = orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+    if body.isascii() and b'\x7f' not in body:
+        return body
+    # Such bytes only occur inside strings, where \uXXXX escapes are valid.
+    return _UNESCAPED.sub(lambda match: encode_basestring_ascii(match.group().decode())[1:-1].encode(), body)
+
+
+def compressible(body):
+    return len(body) >= MIN_COMPRESS_SIZE
+
+
+def lacks_encoding(variants, encoding):
+    """Whether ``variants`` should, but does not yet, hold a copy in ``encoding``."""
+    return encoding is not None and encoding not in variants and compressible(variants['identity'])
+
+
+def encode_variants(body, encodings=ENCODINGS):
+    variants = {'identity': body}
+    if compressible(body):
+        for encoding in encodings:
+            variants[encoding] = COMPRESSORS[encoding](body)
+    return variants
+
+
+def preferred_encoding(accept_encodings):
+    """The content-encoding to send for a parsed ``Accept-Encoding``, or None for the plain body."""
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def select_variant(variants, accept_encodings):
+    """Pick a body for a parsed ``Accept-Encoding``; returns ``(content-encoding or None, body)``."""
+    encoding = accept_encodings.best_match([encoding for encoding in ENCODINGS if encoding in variants])
+    if encoding is None:
+        return None, variants['identity']
+    return encoding, variants[encoding]
+
+
+def make_etag(scope, key, generation):
+    return f'{scope}-{generation}-{zlib.crc32(repr(key).encode()):08x}'
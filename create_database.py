@@ -1,4 +1,5 @@
 import pyodbc
+from bulk_loader import STATS_TABLES, refresh_department_stats
 
 def create_database():
     """Manually create and reset the EmployeeDB database"""
@@ -42,8 +43,13 @@ def create_database():
             IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_employees_Department' AND object_id = OBJECT_ID('employees'))
             CREATE INDEX IX_employees_Department ON employees(Department)
         ''')
+        cursor.execute("CREATE INDEX IX_employees_Department_Name ON employees(Department, Name, ID)")
+        cursor.execute("CREATE INDEX IX_employees_Name ON employees(Name, ID)")
+        for name, create_sql in STATS_TABLES.items():
+            cursor.execute(f"IF EXISTS (SELECT * FROM sysobjects WHERE name='{name}' AND xtype='U') DROP TABLE {name}")
+            cursor.execute(create_sql)
         conn.commit()
-        print("✓ Employees table and index created successfully")
+        print("✓ Employees table and indexes created successfully")
         
         cursor.execute("SELECT COUNT(*) FROM employees")
         count = cursor.fetchone()[0]
@@ -66,6 +72,7 @@ def create_database():
             for emp in sample_data:
                 cursor.execute("INSERT INTO employees (ID, Name, Email, Department, Designation) VALUES (?, ?, ?, ?, ?)", emp)
             
+            refresh_department_stats(cursor)
             conn.commit()
             print(f"✓ {len(sample_data)} sample employees inserted")
         else:
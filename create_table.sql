@@ -28,6 +28,36 @@ BEGIN
     CREATE INDEX IX_employees_Department ON employees(Department);
 END
 
+-- Composite indexes for keyset pagination on (Name, ID)
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_employees_Department_Name' AND object_id = OBJECT_ID('employees'))
+BEGIN
+    CREATE INDEX IX_employees_Department_Name ON employees(Department, Name, ID);
+END
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_employees_Name' AND object_id = OBJECT_ID('employees'))
+BEGIN
+    CREATE INDEX IX_employees_Name ON employees(Name, ID);
+END
+
+-- Department summary, recomputed by every import
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='department_stats' AND xtype='U')
+BEGIN
+    CREATE TABLE department_stats (
+        Department NVARCHAR(50) PRIMARY KEY,
+        Headcount INT NOT NULL
+    );
+END
+
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='department_designation_stats' AND xtype='U')
+BEGIN
+    CREATE TABLE department_designation_stats (
+        Department NVARCHAR(50) NOT NULL,
+        Designation NVARCHAR(50) NOT NULL,
+        Headcount INT NOT NULL,
+        PRIMARY KEY (Department, Designation)
+    );
+END
+
 -- Optional: Insert sample data
 -- DELETE FROM employees;
 -- INSERT INTO employees (ID, Name, Email, Department, Designation) VALUES
@@ -0,0 +1,175 @@
+"""Bounded, thread-safe database connection pool.
+
+Connections are created through a pluggable driver object, normally one of
+the backends in ``backends.py``.  A driver needs a ``dialect`` attribute plus
+``connect()`` and ``ping(conn)`` methods.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, driver, min_size=1, max_size=10, idle_timeout=300, checkout_timeout=10, ping_after=5):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1')
+        self.driver = driver
+        self.dialect = driver.dialect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        # Connections returned less than ``ping_after`` seconds ago are not
+        # pinged again on checkout.
+        self.ping_after = ping_after
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._size = 0
+        self._in_use = 0
+        self._stats = {'checkouts': 0, 'created': 0, 'discarded': 0, 'timeouts': 0,
+                       'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0}
+
+    def prefill(self):
+        """Open connections up to ``min_size``."""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._create()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def acquire(self, timeout=None):
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        while True:
+            conn = None
+            create = False
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(f'No database connection available within {timeout}s')
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                try:
+                    conn = self._create()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                idle_for = time.monotonic() - last_used
+                if self.idle_timeout and idle_for > self.idle_timeout:
+                    self._discard(conn)
+                    continue
+                if idle_for > self.ping_after and not self._healthy(conn):
+                    self._discard(conn)
+                    continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._in_use += 1
+                self._stats['checkouts'] += 1
+                self._stats['wait_seconds_total'] += waited
+                self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], waited)
+            return conn
+
+    def release(self, conn, discard=False):
+        if not discard:
+            try:
+                # Never hand an open transaction to the next borrower.
+                conn.rollback()
+            except Exception as e:
+                logging.warning(f"Discarding pooled connection after failed rollback: {e}")
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+        if discard:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        self._prune()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(size=self._size, idle=len(self._idle), in_use=self._in_use,
+                         min_size=self.min_size, max_size=self.max_size)
+        return stats
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def _create(self):
+        conn = self.driver.connect()
+        with self._cond:
+            self._stats['created'] += 1
+        return conn
+
+    def _healthy(self, conn):
+        try:
+            self.driver.ping(conn)
+            return True
+        except Exception as e:
+            logging.warning(f"Pooled connection failed health check: {e}")
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats['discarded'] += 1
+            self._cond.notify()
+
+    def _prune(self):
+        """Close connections idle longer than ``idle_timeout``, keeping ``min_size``."""
+        if not self.idle_timeout:
+            return
+        expired = []
+        now = time.monotonic()
+        with self._cond:
+            # The oldest connections sit at the left end of the deque.
+            while self._idle and self._size - len(expired) > self.min_size \
+                    and now - self._idle[0][1] > self.idle_timeout:
+                expired.append(self._idle.popleft()[0])
+        for conn in expired:
+            self._discard(conn)
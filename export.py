@@ -0,0 +1,83 @@
+"""Streaming exports of the employee table.
+
+Rows are pulled from an open cursor with ``fetchmany`` and encoded one batch
+at a time, so server memory stays flat however large the roster is.  NDJSON
+and CSV bytes go out as soon as the first batch is fetched.  XLSX is a zip
+archive that can only be finished once every row is known: rows go through
+openpyxl's write-only mode (which spools them to disk) and the finished
+file is streamed from a temporary file.
+"""
+import csv
+import io
+import json
+import tempfile
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def fetch_batches(cursor, batch_size):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def ndjson_chunks(cursor, fields, batch_size):
+    width = len(fields)
+    for rows in fetch_batches(cursor, batch_size):
+        yield ''.join(json.dumps(dict(zip(fields, row[:width])), ensure_ascii=False) + '\n' for row in rows).encode()
+
+
+def csv_chunks(cursor, fields, batch_size, headers):
+    width = len(fields)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    yield buffer.getvalue().encode('utf-8-sig')
+    for rows in fetch_batches(cursor, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(row[:width] for row in rows)
+        yield buffer.getvalue().encode()
+
+
+def xlsx_chunks(cursor, fields, batch_size, headers):
+    from openpyxl import Workbook
+
+    width = len(fields)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Employees')
+    sheet.append(headers)
+    for rows in fetch_batches(cursor, batch_size):
+        for row in rows:
+            sheet.append(list(row[:width]))
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            chunk = f.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def export_chunks(fmt, cursor, fields, headers, batch_size=5000):
+    """Return a generator of encoded chunks for ``fmt``.
+
+    ``cursor`` must already have executed a query whose first columns are
+    ``fields``, in order; ``headers`` are the column titles for CSV/XLSX.
+    """
+    if fmt == 'ndjson':
+        return ndjson_chunks(cursor, fields, batch_size)
+    if fmt == 'csv':
+        return csv_chunks(cursor, fields, batch_size, headers)
+    if fmt == 'xlsx':
+        return xlsx_chunks(cursor, fields, batch_size, headers)
+    raise ValueError(f"Unknown export format '{fmt}', expected one of: {', '.join(EXPORT_FORMATS)}")
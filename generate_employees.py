@@ -1,12 +1,101 @@
+"""Sample and synthetic employee rosters.
+
+``python generate_employees.py`` writes the 10-row sample ``employees.xlsx``.
+``python generate_employees.py 250000 --skew 1.2 --output big.xlsx`` writes a
+synthetic roster of any size; with ``--skew`` above 0 department sizes follow
+a Zipf distribution (the first department is the largest), 0 spreads rows
+evenly.  Rows are generated from a seed, so the same arguments always give
+the same roster.
+"""
+import argparse
+import random
+
 import pandas as pd
+from openpyxl import Workbook
+
+# One worksheet holds at most 1,048,576 rows, including the header.
+MAX_XLSX_ROWS = 1_048_575
 
-data = {
+SAMPLE = {
     'ID': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
     'Name': ['John Doe', 'Jane Smith', 'Bob Johnson', 'Alice Brown', 'Charlie Wilson', 'Diana Prince', 'Peter Parker', 'Mary Johnson', 'David Miller', 'Sarah Connor'],
     'Email': ['john.doe@example.com', 'jane.smith@example.com', 'bob.johnson@example.com', 'alice.brown@example.com', 'charlie.wilson@example.com', 'diana.prince@example.com', 'peter.parker@example.com', 'mary.johnson@example.com', 'david.miller@example.com', 'sarah.connor@example.com'],
     'Department': ['IT', 'HR', 'Finance', 'IT', 'Marketing', 'HR', 'IT', 'Finance', 'Marketing', 'IT'],
     'Designation': ['Software Engineer', 'HR Manager', 'Accountant', 'DevOps Engineer', 'Marketing Coordinator', 'Recruiter', 'Web Developer', 'Financial Analyst', 'Content Creator', 'Data Scientist']
 }
-df = pd.DataFrame(data)
-df.to_excel('employees.xlsx', index=False)
-print('Sample Excel file created: employees.xlsx')
\ No newline at end of file
+
+DESIGNATIONS = {
+    'IT': ['Software Engineer', 'DevOps Engineer', 'Web Developer', 'Data Scientist', 'QA Engineer', 'Architect'],
+    'HR': ['HR Manager', 'Recruiter', 'HR Generalist', 'Payroll Specialist'],
+    'Finance': ['Accountant', 'Financial Analyst', 'Controller', 'Auditor'],
+    'Marketing': ['Marketing Coordinator', 'Content Creator', 'Brand Manager', 'SEO Specialist'],
+    'Sales': ['Account Executive', 'Sales Manager', 'Sales Engineer', 'Business Developer'],
+    'Operations': ['Operations Manager', 'Logistics Coordinator', 'Analyst'],
+    'Support': ['Support Engineer', 'Support Lead', 'Technical Writer'],
+    'Legal': ['Counsel', 'Paralegal', 'Compliance Officer'],
+    'Research': ['Research Scientist', 'Research Engineer', 'Lab Technician'],
+    'Facilities': ['Facilities Manager', 'Technician'],
+}
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+               'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+               'Priya', 'Wei', 'Aisha', 'Mateo', 'Yuki', 'Olga', 'Kwame', 'Fatima', 'Lars', 'Ana']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee',
+              'Patel', 'Chen', 'Okafor', 'Silva', 'Tanaka', 'Ivanova', 'Mensah', 'Khan', 'Nilsson', 'Costa']
+
+
+def department_weights(departments, skew):
+    """Relative size of each department: ``1 / rank ** skew``."""
+    return [1 / rank ** skew for rank in range(1, len(departments) + 1)]
+
+
+def generate_rows(count, skew=0.0, seed=42, departments=tuple(DESIGNATIONS)):
+    """Yield ``count`` (ID, Name, Email, Department, Designation) tuples with IDs 1..count."""
+    rng = random.Random(seed)
+    weights = department_weights(departments, skew)
+    batch = 10_000
+    emp_id = 0
+    while emp_id < count:
+        size = min(batch, count - emp_id)
+        for department in rng.choices(departments, weights=weights, k=size):
+            emp_id += 1
+            first = rng.choice(FIRST_NAMES)
+            last = rng.choice(LAST_NAMES)
+            yield (emp_id, f'{first} {last}', f'{first.lower()}.{last.lower()}{emp_id}@example.com',
+                   department, rng.choice(DESIGNATIONS.get(department, ['Associate'])))
+
+
+def write_workbook(path, rows):
+    """Write rows to ``path`` as an upload-ready workbook; returns the row count."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Employees')
+    sheet.append(['ID', 'Name', 'Email', 'Department', 'Designation'])
+    count = 0
+    for row in rows:
+        count += 1
+        if count > MAX_XLSX_ROWS:
+            raise ValueError(f'A worksheet holds at most {MAX_XLSX_ROWS} employees')
+        sheet.append(row)
+    workbook.save(path)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write an employee workbook.')
+    parser.add_argument('rows', nargs='?', type=int, help='number of synthetic employees (default: the 10-row sample)')
+    parser.add_argument('--skew', type=float, default=0.0, help='Zipf exponent for department sizes, 0 = even')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='employees.xlsx')
+    args = parser.parse_args()
+
+    if args.rows is None:
+        pd.DataFrame(SAMPLE).to_excel(args.output, index=False)
+        print(f'Sample Excel file created: {args.output}')
+        return
+    count = write_workbook(args.output, generate_rows(args.rows, skew=args.skew, seed=args.seed))
+    print(f'Synthetic Excel file created: {args.output} ({count} employees, skew {args.skew})')
+
+
+if __name__ == '__main__':
+    main()
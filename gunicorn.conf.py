@@ -0,0 +1,41 @@
+"""gunicorn settings for ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+Threaded workers (``gthread``): requests mostly wait on the database, so a
+few threads per process serve concurrent requests without a process each.
+Keep ``DB_POOL_MAX_SIZE`` at least ``GUNICORN_THREADS`` so threads never
+queue for a connection.  The app is preloaded in the master, so new and
+recycled workers are forked from an already imported app instead of
+importing it again.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+preload_app = True
+
+# Recycle workers after a number of requests (with jitter so they do not
+# all restart at once) to bound memory growth.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = max_requests // 10
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+# Import jobs run inside the workers; a stopping worker waits this long for
+# a running import before it is killed (the next worker to start resumes it).
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '300'))
+keepalive = 5
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
+
+
+def post_fork(server, worker):
+    from app import start_worker
+    start_worker()
+
+
+def worker_exit(server, worker):
+    from app import import_jobs
+    import_jobs.shutdown(wait=True)
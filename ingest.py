@@ -0,0 +1,125 @@
+"""Streaming import pipeline for employee workbooks.
+
+The workbook is read with openpyxl in read-only mode and handed on in
+fixed-size chunks: each chunk is validated and passed straight to the
+BulkLoader, so memory use depends on the chunk size rather than on the
+number of rows in the file.
+
+openpyxl, pandas and the validator are imported on first use so that
+importing this module (and the web app) stays cheap.
+"""
+import time
+
+from bulk_loader import BulkLoader, EMPLOYEE_COLUMNS
+
+
+class ExcelFormatError(ValueError):
+    pass
+
+
+class ImportValidationError(ValueError):
+    def __init__(self, report):
+        super().__init__(report.summary())
+        self.report = report
+
+
+class ExcelChunkReader:
+    """Iterate over ``(first_row_number, rows)`` chunks of a worksheet.
+
+    Each row is a tuple holding the ``columns`` values in order; row numbers
+    are 1-based spreadsheet rows (the header is row 1).
+    """
+
+    def __init__(self, path, columns=EMPLOYEE_COLUMNS, chunk_size=5000):
+        from openpyxl import load_workbook
+
+        self.columns = columns
+        self.chunk_size = max(1, int(chunk_size))
+        self._workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            self._rows = self._workbook.active.iter_rows(values_only=True)
+            header = next(self._rows, None) or ()
+            names = [str(name).strip() if name is not None else None for name in header]
+            if not all(col in names for col in columns):
+                raise ExcelFormatError(f'Excel file must contain columns: {", ".join(columns)}')
+            self._positions = [names.index(col) for col in columns]
+        except Exception:
+            self.close()
+            raise
+
+    def __iter__(self):
+        positions = self._positions
+        width = max(positions) + 1
+        chunk = []
+        start_row = 2
+        for values in self._rows:
+            if len(values) < width:
+                values = tuple(values) + (None,) * (width - len(values))
+            chunk.append(tuple(values[i] for i in positions))
+            if len(chunk) >= self.chunk_size:
+                yield start_row, chunk
+                start_row += len(chunk)
+                chunk = []
+        if chunk:
+            yield start_row, chunk
+
+    def close(self):
+        self._workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def import_excel(reader, conn, backend, batch_size=5000, mode='swap', report=None, progress=None, dry_run=False):
+    """Validate and load every chunk from ``reader``; returns the loader's result dict.
+
+    Once a chunk fails validation nothing more is loaded, but the remaining
+    chunks are still validated so the report lists every error; the load is
+    then aborted, leaving the live table untouched.  ``progress``, if given,
+    is called with the number of sheet rows processed after each chunk.
+    The result's ``phases`` entry holds the seconds spent parsing the
+    workbook, validating and writing to the database.  ``dry_run`` (merge
+    mode only) counts the changes the file would make without writing them.
+    """
+    import pandas as pd
+
+    from validation import EmployeeValidator
+
+    validator = EmployeeValidator(report)
+    phases = {'parse': 0.0, 'validate': 0.0, 'insert': 0.0}
+
+    def batches():
+        processed = 0
+        chunks = iter(reader)
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            if chunk is None:
+                phases['parse'] += time.perf_counter() - started
+                break
+            start_row, rows = chunk
+            frame = pd.DataFrame.from_records(rows, columns=list(reader.columns))
+            parsed = time.perf_counter()
+            phases['parse'] += parsed - started
+            clean = validator.validate(frame, first_row=start_row)
+            phases['validate'] += time.perf_counter() - parsed
+            processed += len(rows)
+            if progress:
+                progress(processed)
+            if validator.report.ok:
+                yield list(zip(clean['ID'].tolist(), clean['Name'].tolist(), clean['Email'].tolist(),
+                               clean['Department'].tolist(), clean['Designation'].tolist()))
+        if not validator.report.ok:
+            raise ImportValidationError(validator.report)
+
+    loader = BulkLoader(conn, backend, batch_size=batch_size, mode=mode, dry_run=dry_run)
+    started = time.perf_counter()
+    result = loader.load_batches(batches())
+    # The loader pulls chunks as it goes; whatever was not spent producing
+    # them went to the database.
+    phases['insert'] = max(0.0, time.perf_counter() - started - phases['parse'] - phases['validate'])
+    result['phases'] = {phase: round(seconds, 3) for phase, seconds in phases.items()}
+    return result
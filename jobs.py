@@ -0,0 +1,220 @@
+"""Background import jobs.
+
+Uploads are handed to a small thread pool instead of being processed inside
+the HTTP request.  Each job's state is written to ``<state_dir>/<id>.json``
+after every change, so a restarted worker can pick up jobs that were still
+queued or running when it stopped.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows, where only the single-process dev server runs
+    fcntl = None
+
+ACTIVE_STATUSES = ('queued', 'running')
+PUBLIC_FIELDS = ('id', 'status', 'filename', 'mode', 'blob', 'created_at', 'started_at', 'finished_at',
+                 'rows_processed', 'rows_per_second', 'result', 'error', 'report_id')
+
+
+class ImportJobManager:
+    def __init__(self, state_dir, runner, max_workers=1):
+        """``runner(job, progress)`` performs the import and returns a result dict.
+
+        ``progress(rows_processed)`` may be called any number of times.
+        """
+        self.state_dir = state_dir
+        self.runner = runner
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='import')
+        os.makedirs(state_dir, exist_ok=True)
+
+    def submit(self, path, filename, mode, blob=None):
+        """Queue an import of ``path``; ``blob`` is its digest in the blob store."""
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'path': path,
+            'filename': filename,
+            'mode': mode,
+            'blob': blob,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'rows_processed': 0,
+            'rows_per_second': 0.0,
+            'result': None,
+            'error': None,
+            'report_id': None,
+        }
+        self._save(job)
+        self._executor.submit(self._run, job['id'])
+        return job
+
+    def get(self, job_id):
+        try:
+            job_id = uuid.UUID(hex=job_id).hex
+        except ValueError:
+            return None
+        return self._load(job_id)
+
+    def active(self):
+        """Jobs that are queued or running, in any process."""
+        jobs = []
+        for name in os.listdir(self.state_dir):
+            if name.endswith('.json'):
+                job = self._load(name[:-5])
+                if job and job['status'] in ACTIVE_STATUSES:
+                    jobs.append(job)
+        return jobs
+
+    def public(self, job):
+        return {field: job.get(field) for field in PUBLIC_FIELDS}
+
+    def resume(self):
+        """Re-queue jobs left queued or running by a previous process.
+
+        Worker processes that start together may all call this; the scan is
+        serialized across processes so a stale lock is only cleared once.
+        """
+        with self._file_lock('resume.lock'):
+            resumed = self._resume()
+        if resumed:
+            logging.info(f"Resumed {resumed} import jobs")
+        return resumed
+
+    def _resume(self):
+        resumed = 0
+        for name in os.listdir(self.state_dir):
+            if not name.endswith('.json'):
+                continue
+            job = self._load(name[:-5])
+            if not job or job['status'] not in ACTIVE_STATUSES:
+                continue
+            lock_pid = self._lock_owner(job['id'])
+            # Nothing runs in this process yet, so a lock holding our own pid
+            # was left behind by a previous process that reused it.
+            if lock_pid is not None and lock_pid != os.getpid() and _pid_alive(lock_pid):
+                continue
+            if lock_pid is not None:
+                self._release_claim(job['id'])
+            if not os.path.exists(job['path']):
+                self._finish(job, 'failed', error='Uploaded file is no longer available')
+                continue
+            job.update(status='queued', rows_processed=0, rows_per_second=0.0, started_at=None)
+            self._save(job)
+            self._executor.submit(self._run, job['id'])
+            resumed += 1
+        return resumed
+
+    # Held across processes; flock also excludes other threads of this
+    # process, since each caller opens its own file description.
+    @contextmanager
+    def _file_lock(self, name):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.state_dir, name), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job_id):
+        if not self._claim(job_id):
+            return
+        try:
+            # Imports load through one staging table and bump one dataset
+            # generation, so they run one at a time across all workers; a job
+            # waiting here stays queued.
+            with self._file_lock('import.lock'):
+                self._run_claimed(job_id)
+        finally:
+            self._release_claim(job_id)
+
+    def _run_claimed(self, job_id):
+        job = self._load(job_id)
+        if not job or job['status'] not in ACTIVE_STATUSES:
+            return
+        job.update(status='running', started_at=time.time())
+        self._save(job)
+
+        def progress(rows_processed):
+            elapsed = max(time.time() - job['started_at'], 1e-6)
+            job.update(rows_processed=rows_processed, rows_per_second=round(rows_processed / elapsed, 1))
+            self._save(job)
+
+        try:
+            result = self.runner(job, progress)
+            self._finish(job, 'succeeded', result=result)
+        except Exception as e:
+            logging.error(f"Import job {job_id} failed: {e}")
+            self._finish(job, 'failed', error=str(e), report_id=getattr(e, 'report_id', None))
+
+    def _finish(self, job, status, **fields):
+        job.update(status=status, finished_at=time.time(), **fields)
+        if job.get('started_at'):
+            elapsed = max(job['finished_at'] - job['started_at'], 1e-6)
+            job['rows_per_second'] = round(job['rows_processed'] / elapsed, 1)
+        self._save(job)
+
+    def _path(self, job_id):
+        return os.path.join(self.state_dir, f'{job_id}.json')
+
+    def _load(self, job_id):
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, job):
+        path = self._path(job['id'])
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    # A lock file holding the owner's pid stops two worker processes from
+    # running the same job after a restart.
+    def _claim(self, job_id):
+        try:
+            fd = os.open(self._path(job_id) + '.lock', os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
+
+    def _release_claim(self, job_id):
+        try:
+            os.remove(self._path(job_id) + '.lock')
+        except FileNotFoundError:
+            pass
+
+    def _lock_owner(self, job_id):
+        try:
+            with open(self._path(job_id) + '.lock') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
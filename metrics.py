@@ -0,0 +1,321 @@
+"""In-process performance metrics in the Prometheus text format.
+
+Histograms, counters and gauges live in a ``Registry`` and are rendered by
+``/metrics``.  Each worker process keeps its own numbers, so scrape every
+process (or run one) when serving with several workers.
+
+``TimedConnection`` and ``TimedCursor`` wrap a DB-API connection/cursor and
+report how long ``execute`` and the ``fetch*`` calls take and how many rows
+came back, without the callers changing how they use the cursor.
+``RequestTimings`` collects those numbers for one request and
+``RequestProfiler`` runs cProfile around a single request.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PHASE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 100000, 1000000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labels):
+            raise ValueError(f'{self.name} expects labels {self.labels}, got {labels}')
+        return tuple(str(value) for value in labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f'{self.name}{_labels(self.labels, key)} {_number(value)}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value read from ``callback()`` at scrape time.
+
+    The callback returns a number, or a dict mapping label-value tuples to
+    numbers for a gauge with labels.  ``monotonic=True`` exports a running
+    total kept elsewhere (e.g. the pool's checkout count) as a counter.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, help, callback, labels=(), monotonic=False):
+        super().__init__(name, help, labels)
+        self.callback = callback
+        if monotonic:
+            self.kind = 'counter'
+
+    def render(self):
+        try:
+            value = self.callback()
+        except Exception as e:
+            logging.warning(f"Could not collect metric {self.name}: {e}")
+            return []
+        with self._lock:
+            self._series = value if isinstance(value, dict) else {(): value}
+        return super().render()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (not cumulative) counts, then sum and count.
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _render_series(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = 'le="' + _number(bound) + '"'
+            lines.append(f'{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}')
+        lines.append(f'{self.name}_sum{_labels(self.labels, key)} {_number(total)}')
+        lines.append(f'{self.name}_count{_labels(self.labels, key)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name, help, callback, labels=(), monotonic=False):
+        return self._add(Gauge(name, help, callback, labels, monotonic))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+class RequestTimings:
+    """Seconds per phase (connect, query, fetch, serialize) and rows fetched for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.rows = 0
+
+    def record(self, phase, seconds, rows=None):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        if rows:
+            self.rows += rows
+
+    def server_timing(self):
+        """The phases as a ``Server-Timing`` header value (milliseconds)."""
+        return ', '.join(f'{phase};dur={seconds * 1000:.2f}' for phase, seconds in self.phases.items())
+
+
+class CountingIterable:
+    """Pass a streamed response body through, counting its bytes in ``size``."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.size = 0
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.size += len(chunk)
+            yield chunk
+
+    def close(self):
+        close = getattr(self.chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+class TimedCursor:
+    """Cursor wrapper calling ``record(phase, seconds, rows)`` after each call.
+
+    ``phase`` is ``'query'`` for ``execute``/``executemany`` (``rows`` is
+    None) and ``'fetch'`` for the ``fetch*`` methods.
+    """
+
+    def __init__(self, cursor, record):
+        self.raw = cursor
+        self._record = record
+
+    def execute(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = self.raw.execute(*args, **kwargs)
+        finally:
+            self._record('query', time.perf_counter() - started, None)
+        return self if result is self.raw else result
+
+    def executemany(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = self.raw.executemany(*args, **kwargs)
+        finally:
+            self._record('query', time.perf_counter() - started, None)
+        return self if result is self.raw else result
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self.raw.fetchone()
+        self._record('fetch', time.perf_counter() - started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, *args):
+        started = time.perf_counter()
+        rows = self.raw.fetchmany(*args)
+        self._record('fetch', time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self.raw.fetchall()
+        self._record('fetch', time.perf_counter() - started, len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class TimedConnection:
+    def __init__(self, conn, record):
+        self.raw = conn
+        self._record = record
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self.raw.cursor(*args, **kwargs), self._record)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class RequestProfiler:
+    """cProfile one request at a time and keep the stats under ``directory``.
+
+    Only one profile can run per process (cProfile hooks the interpreter
+    globally on recent Pythons), so ``start`` returns None while another
+    request is being profiled.
+    """
+
+    def __init__(self, directory, top=25):
+        self.directory = directory
+        self.top = top
+        self._lock = threading.Lock()
+
+    def start(self):
+        if not self._lock.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except Exception:
+            self._lock.release()
+            raise
+        return profile
+
+    def stop(self, profile, profile_id, label):
+        """Stop ``profile``, save it as ``<profile_id>.prof`` and log the top functions."""
+        try:
+            profile.disable()
+        finally:
+            self._lock.release()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{profile_id}.prof')
+        profile.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(self.top)
+        logging.info(f"Profile {profile_id} for {label} saved to {path}\n{out.getvalue()}")
+        return path
+
+
+def _benchmark(observations=1_000_000):
+    """Cost of one histogram observation and of rendering a populated registry."""
+    registry = Registry()
+    histogram = registry.histogram('bench_seconds', 'Benchmark histogram.', ('route',))
+    routes = [f'/route/{i}' for i in range(20)]
+    started = time.perf_counter()
+    for i in range(observations):
+        histogram.observe((i % 1000) / 10000, routes[i % 20])
+    elapsed = time.perf_counter() - started
+    print(f"observe: {elapsed / observations * 1e9:.0f}ns per call")
+    started = time.perf_counter()
+    text = registry.render()
+    print(f"render:  {(time.perf_counter() - started) * 1000:.2f}ms ({len(text)} bytes)")
+
+
+if __name__ == '__main__':
+    import sys
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,354 @@
+"""Columnar in-memory snapshot of the employees table for the read API.
+
+Building ``/api/employees`` responses from ``fetchall()`` creates a tuple,
+a dict and several boxed values per row, which for a large roster costs
+more memory and time than the data itself.  A ``RosterSnapshot`` holds the
+table once per dataset generation, in the API's (Name, ID) order, as:
+
+* an ``array`` of IDs;
+* Name and Email as string tables: every value already JSON-encoded,
+  concatenated into one ``bytes`` object with an ``array`` of offsets;
+* Department and Designation dictionary-encoded: an ``array`` of small
+  integer codes per row and one JSON-encoded entry per distinct value;
+* the row positions grouped by department with each department's offsets,
+  so a department filter is one slice that is still in (Name, ID) order.
+
+A page is a slice of positions, and its JSON is assembled from the
+pre-encoded fragments with one ``bytes`` format per row; no per-row objects
+are kept between requests.
+
+The rows are in the database's collation, which Python's string comparison
+does not follow (SQL Server's default ignores case and trailing spaces), so
+the snapshot never compares strings by value.  A cursor is found by the ID
+of the row it names.  A department filter is served only for an exact
+spelling that, by the database's ``GROUP BY Department`` counts, no other
+spelling is equal to.  Any other page raises ``DatabaseOnly`` and is read
+from the database.
+
+``SnapshotLoader`` keeps the snapshot for the current generation and
+rebuilds it (on a background thread when asked from a request) after an
+import.
+"""
+import json
+import logging
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from json.encoder import encode_basestring_ascii
+
+from bulk_loader import TABLE
+
+FIELDS = ('id', 'name', 'email', 'department', 'designation')
+STRING_FIELDS = ('name', 'email')
+CODED_FIELDS = ('department', 'designation')
+
+
+class DatabaseOnly(Exception):
+    """A page the snapshot cannot produce exactly as the database would."""
+
+
+class StaleCursor(DatabaseOnly):
+    """The row a page cursor names is not in the snapshot (or not on the requested slice)."""
+
+
+class AmbiguousDepartment(DatabaseOnly):
+    """A department filter the database may match against other spellings."""
+
+
+def json_fragment(value):
+    """``value`` as it appears in a compact, ASCII-only JSON document."""
+    return b'null' if value is None else encode_basestring_ascii(value).encode('ascii')
+
+
+def narrow(values, maximum):
+    """Copy ``values`` into the smallest unsigned array type that holds ``maximum``."""
+    for typecode in ('B', 'H', 'I', 'Q'):
+        if maximum < 1 << (8 * array(typecode).itemsize):
+            return array(typecode, values)
+
+
+class RosterSnapshot:
+    def __init__(self, rows, generation=None, department_counts=None):
+        """Build from (ID, Name, Email, Department, Designation) rows in (Name, ID) order.
+
+        ``department_counts`` maps the departments ``GROUP BY Department``
+        returns to their row counts; without it every spelling is taken to
+        be distinct, as under a binary collation.
+        """
+        self.generation = generation
+        self.ids = array('q')
+        strings = {field: (bytearray(), array('Q', [0])) for field in STRING_FIELDS}
+        codes = {field: array('I') for field in CODED_FIELDS}
+        tables = {field: {} for field in CODED_FIELDS}
+        for row in rows:
+            self.ids.append(row[0])
+            for field, value in ((STRING_FIELDS[0], row[1]), (STRING_FIELDS[1], row[2])):
+                data, offsets = strings[field]
+                data += json_fragment(value)
+                offsets.append(len(data))
+            for field, value in ((CODED_FIELDS[0], row[3]), (CODED_FIELDS[1], row[4])):
+                table = tables[field]
+                code = table.get(value)
+                if code is None:
+                    code = table[value] = len(table)
+                codes[field].append(code)
+
+        count = len(self.ids)
+        self.strings = {field: (bytes(data), narrow(offsets, len(data)))
+                        for field, (data, offsets) in strings.items()}
+        del strings
+        self.values = {field: list(tables[field]) for field in CODED_FIELDS}
+        self.encoded = {field: [json_fragment(value) for value in self.values[field]] for field in CODED_FIELDS}
+        self.codes = {field: narrow(codes[field], len(tables[field])) for field in CODED_FIELDS}
+
+        # Positions grouped by department, each group still in (Name, ID)
+        # order: a counting sort on the department codes.
+        department_codes = self.codes['department']
+        sizes = [0] * len(self.values['department'])
+        for code in department_codes:
+            sizes[code] += 1
+        starts, start = [], 0
+        for size in sizes:
+            starts.append(start)
+            start += size
+        self.departments = {value: (starts[code], starts[code] + sizes[code])
+                            for code, value in enumerate(self.values['department'])}
+        by_department = [0] * count
+        department_rank = [0] * count
+        fill = list(starts)
+        for position, code in enumerate(department_codes):
+            by_department[fill[code]] = position
+            department_rank[position] = fill[code]
+            fill[code] += 1
+        self.by_department = narrow(by_department, count)
+        self.department_rank = narrow(department_rank, count)
+        # A spelling the database grouped under itself with all of its rows
+        # is equal to no other spelling, so filtering on it is exact.
+        self.exact_departments = {department for department, (start, end) in self.departments.items()
+                                  if department_counts is None or department_counts.get(department) == end - start}
+        # Positions in ID order, to find the row a page cursor points at.
+        self.id_order = narrow(sorted(range(count), key=self.ids.__getitem__), count)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, conn, generation=None, batch_size=5000):
+        """Read the employees table through ``conn``."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'SELECT Department, COUNT(*) FROM {TABLE} GROUP BY Department')
+            department_counts = {department: count for department, count in cursor.fetchall()}
+            cursor.execute(f'SELECT ID, Name, Email, Department, Designation FROM {TABLE} ORDER BY Name, ID')
+
+            def rows():
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        return
+                    yield from batch
+
+            return cls(rows(), generation, department_counts)
+        finally:
+            cursor.close()
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the snapshot."""
+        arrays = [self.ids, self.by_department, self.department_rank, self.id_order]
+        arrays.extend(offsets for _, offsets in self.strings.values())
+        arrays.extend(self.codes.values())
+        total = sum(len(values) * values.itemsize for values in arrays)
+        total += sum(len(data) for data, _ in self.strings.values())
+        for field in CODED_FIELDS:
+            total += sum(sys.getsizeof(value) for value in self.values[field])
+            total += sum(sys.getsizeof(fragment) for fragment in self.encoded[field])
+        return total
+
+    def value(self, field, position):
+        if field == 'id':
+            return self.ids[position]
+        if field in self.codes:
+            return self.values[field][self.codes[field][position]]
+        data, offsets = self.strings[field]
+        return json.loads(data[offsets[position]:offsets[position + 1]])
+
+    def page(self, fields, department=None, after=None, limit=None):
+        """JSON array of ``fields`` for one page, and the (Name, ID) key of its last row.
+
+        ``after`` is a decoded (Name, ID) cursor.  The key is None on the last
+        page or when ``limit`` is not given.  Raises ``AmbiguousDepartment``
+        unless ``department`` is an exact spelling no other one is equal to,
+        and ``StaleCursor`` when the cursor's row is not on this slice.
+        """
+        if department:
+            if department not in self.exact_departments:
+                raise AmbiguousDepartment(f'Department {department!r} is not one exact spelling here')
+            lo, hi = self.departments[department]
+            positions = self.by_department
+            rank = self.department_rank
+        else:
+            lo, hi = 0, len(self)
+            positions = range(len(self))
+            rank = None
+        if after:
+            lo = self._after(after, positions, rank, lo, hi)
+        end = hi if limit is None else min(hi, lo + limit)
+        selected = positions[lo:end]
+
+        key = None
+        if limit is not None and end < hi:
+            last = selected[-1]
+            key = (self.value('name', last), self.ids[last])
+        return self.serialize(selected, fields), key
+
+    def serialize(self, positions, fields):
+        """Compact JSON array of objects with ``fields`` (keys sorted) for ``positions``."""
+        if not len(positions):
+            return b'[]'
+        names = sorted(fields)
+        template = b'{' + b','.join(
+            b'"' + field.encode() + (b'":%d' if field == 'id' else b'":%b') for field in names) + b'}'
+        columns = [self._column(field, positions) for field in names]
+        return b'[' + b','.join([template % values for values in zip(*columns)]) + b']'
+
+    def _column(self, field, positions):
+        contiguous = isinstance(positions, range)
+        if field == 'id':
+            return self.ids[positions.start:positions.stop] if contiguous else [self.ids[p] for p in positions]
+        if field in self.codes:
+            codes = self.codes[field]
+            if contiguous:
+                codes = codes[positions.start:positions.stop]
+            else:
+                codes = [codes[p] for p in positions]
+            return list(map(self.encoded[field].__getitem__, codes))
+        data, offsets = self.strings[field]
+        if contiguous:
+            bounds = zip(offsets[positions.start:positions.stop], offsets[positions.start + 1:positions.stop + 1])
+        else:
+            bounds = ((offsets[p], offsets[p + 1]) for p in positions)
+        return [data[start:end] for start, end in bounds]
+
+    def _after(self, after, positions, rank, lo, hi):
+        """Index in ``positions[lo:hi]`` of the first row after the (Name, ID) cursor."""
+        name, emp_id = after
+        i = bisect_right(self.id_order, emp_id, key=self.ids.__getitem__) - 1
+        if i >= 0:
+            position = self.id_order[i]
+            if self.ids[position] == emp_id and self.value('name', position) == name:
+                index = position if rank is None else rank[position]
+                if lo <= index < hi:
+                    return index + 1
+        # A cursor that names no row here cannot be placed by value.
+        raise StaleCursor(f'No row ({name!r}, {emp_id}) on this slice')
+
+
+class SnapshotLoader:
+    """The snapshot for the current dataset generation."""
+
+    def __init__(self):
+        self.snapshot = None
+        self._sync_lock = threading.Lock()
+
+    def current(self, generation):
+        snapshot = self.snapshot
+        return snapshot if snapshot is not None and snapshot.generation == generation else None
+
+    def sync(self, conn, generation):
+        """Build the snapshot for ``generation`` unless it is already current."""
+        with self._sync_lock:
+            snapshot = self.current(generation)
+            if snapshot is not None:
+                return snapshot
+            # The stale snapshot is never served again; let it go before the
+            # new one is built rather than holding both.
+            self.snapshot = None
+            started = time.perf_counter()
+            snapshot = RosterSnapshot.load(conn, generation)
+            self.snapshot = snapshot
+            logging.info(f"Employee snapshot at generation {generation}: {len(snapshot)} rows, "
+                         f"{snapshot.nbytes / 1048576:.1f}MB in {time.perf_counter() - started:.2f}s")
+            return snapshot
+
+    def start_sync(self, connect, generation, then=None):
+        """Build the snapshot on a daemon thread, using a connection from ``connect()``.
+
+        ``then(snapshot)`` is called once it is built.  Does nothing while a
+        build is already running.
+        """
+        if self._sync_lock.locked():
+            return
+
+        def run():
+            try:
+                with connect() as conn:
+                    snapshot = self.sync(conn, generation)
+                if then is not None:
+                    then(snapshot)
+            except Exception as e:
+                logging.error(f"Employee snapshot build error: {e}")
+
+        threading.Thread(target=run, name='employee-snapshot', daemon=True).start()
+
+
+def _benchmark(rows=250_000, repeats=5):
+    """Memory and latency of the snapshot against dicts built from fetchall()."""
+    import tracemalloc
+    from generate_employees import generate_rows
+
+    data = sorted(generate_rows(rows, skew=1.0), key=lambda row: (row[1], row[0]))
+    employer = ('id', 'name', 'department')
+
+    def dict_page(fields, department=None):
+        # What query_employees returns and jsonify encodes.
+        selected = data if department is None else [row for row in data if row[3] == department]
+        columns = [FIELDS.index(field) for field in fields]
+        return json.dumps({'employees': [dict(zip(fields, [row[i] for i in columns])) for row in selected]},
+                          separators=(',', ':'), sort_keys=True).encode()
+
+    tracemalloc.start()
+    rows_copy = [tuple(row) for row in data]
+    dicts = [dict(zip(FIELDS, row)) for row in rows_copy]
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    del rows_copy, dicts
+    tracemalloc.stop()
+    tracemalloc.start()
+    snapshot = RosterSnapshot(data)
+    snapshot_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    started = time.perf_counter()
+    snapshot = RosterSnapshot(data)
+    build = time.perf_counter() - started
+    print(f"{rows} rows: fetchall() tuples + dicts {dict_bytes / 1048576:.1f}MB, "
+          f"snapshot {snapshot_bytes / 1048576:.1f}MB (built in {build:.2f}s)")
+
+    department = data[0][3]
+    cases = [
+        ('full listing', tuple(FIELDS), None),
+        ('employer=true', employer, None),
+        (f'department={department}', tuple(FIELDS), department),
+    ]
+    for label, fields, dept in cases:
+        started = time.perf_counter()
+        for _ in range(repeats):
+            expected = dict_page(fields, dept)
+        dict_time = (time.perf_counter() - started) / repeats
+        started = time.perf_counter()
+        for _ in range(repeats):
+            body = b'{"employees":' + snapshot.page(fields, dept)[0] + b'}'
+        snapshot_time = (time.perf_counter() - started) / repeats
+        assert body == expected, label
+        print(f"{label + ':':<28}dicts + json {dict_time * 1000:8.1f}ms   snapshot {snapshot_time * 1000:8.1f}ms")
+
+    after = (snapshot.value('name', rows // 2), snapshot.ids[rows // 2])
+    started = time.perf_counter()
+    for _ in range(1000):
+        snapshot.page(FIELDS, after=after, limit=100)
+    print(f"{'100-row page after cursor:':<28}snapshot {(time.perf_counter() - started):8.3f}ms")
+
+
+if __name__ == '__main__':
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 250_000)
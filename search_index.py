@@ -0,0 +1,458 @@
+"""In-memory search over employee Name, Email and Designation.
+
+Text is normalised to lower-case word tokens (``John.Doe@example.com`` gives
+``john``, ``doe``, ``example``, ``com``) and a query matches a row when every
+query word is a prefix of one of the row's tokens.  The index keeps:
+
+* a sorted list of each row's normalised Name and Email, so a query typed
+  from the start of either ("john d", "john.do") is one ``bisect`` range;
+* a posting set of employee IDs per token, with the tokens in a sorted list
+  so all tokens starting with a prefix are a contiguous range.  Queries that
+  are not a leading phrase are answered by scanning the word with the fewest
+  postings and checking the others, stopping once ``limit`` rows are found;
+* a trigram index over Name and Designation words: a query word that is not
+  a prefix of any token falls back to words within a small edit distance,
+  where swapping two adjacent letters is one edit ("jonh" finds "john").  Email tokens such as ``doe1234`` are mostly unique
+  per row and are left out of it.
+
+``sync`` follows the dataset generation: it re-reads the table and
+re-indexes only the rows whose values changed, so an upload that touches a
+few employees costs one table scan rather than a full rebuild.
+``start_sync`` runs it on a background thread, and searches are served from
+the previous state until it finishes.
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from itertools import islice
+
+from bulk_loader import TABLE
+
+TOKEN_PATTERN = re.compile(r'\w+')
+SEARCH_FIELDS = ('id', 'name', 'email', 'department', 'designation')
+DEFAULT_LIMIT = 20
+SEP = '\x00'
+
+# Above this many new or dropped entries a sorted list is re-sorted in one
+# go instead of being patched entry by entry.
+RESORT_THRESHOLD = 1000
+
+# Prefix ranges up to this many tokens have their postings counted exactly;
+# wider ones are extrapolated from the first SELECTIVITY_SAMPLE tokens.
+VOLUME_SCAN_LIMIT = 4096
+SELECTIVITY_SAMPLE = 64
+
+# Relative cost of adding an ID to a set versus checking one candidate's
+# token string, used to choose how a secondary query word is applied.
+UNION_COST = 0.1
+
+# Candidates are filtered this many at a time so a broad driver word stops
+# early once ``limit`` rows are found.
+SCAN_CHUNK = 256
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text).lower()) if text is not None else []
+
+
+def row_tokens(row):
+    """Distinct tokens of a (ID, Name, Email, Department, Designation) row."""
+    return tuple(dict.fromkeys(tokenize(row[1]) + tokenize(row[2]) + tokenize(row[4])))
+
+
+def row_words(row):
+    """The Name and Designation tokens of a row, which fuzzy matching covers."""
+    return tokenize(row[1]) + tokenize(row[4])
+
+
+def row_phrases(row):
+    """Sorted-list entries for a row's Name and Email: ``'<normalised text>\\x00<ID>'``."""
+    phrases = {' '.join(tokenize(row[1])), ' '.join(tokenize(row[2]))}
+    return [f'{phrase}{SEP}{row[0]}' for phrase in phrases if phrase]
+
+
+def trigrams(word):
+    padded = f'${word}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(word):
+    return 1 if len(word) <= 8 else 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance of ``a`` and ``b``, or ``limit + 1`` once it exceeds ``limit``.
+
+    Levenshtein distance, except that swapping two adjacent letters, the
+    most common typo, is one edit rather than two.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            distance = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                distance = min(distance, before[j - 2] + 1)
+            current.append(distance)
+        # A swap ending in the next row costs no less than this row's
+        # cell before it, so the cut-off still holds.
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def patch_sorted(items, added, dropped):
+    """Apply ``added``/``dropped`` to the sorted list ``items``; returns the list."""
+    if len(added) + len(dropped) > RESORT_THRESHOLD:
+        if dropped:
+            items = [item for item in items if item not in dropped]
+        items.extend(added)
+        items.sort()
+        return items
+    for item in dropped:
+        i = bisect.bisect_left(items, item)
+        if i < len(items) and items[i] == item:
+            del items[i]
+    for item in added:
+        i = bisect.bisect_left(items, item)
+        if i == len(items) or items[i] != item:
+            items.insert(i, item)
+    return items
+
+
+class _TokenRange:
+    """A slice of the sorted vocabulary that is too wide to copy."""
+
+    def __init__(self, tokens, lo, hi):
+        self.tokens, self.lo, self.hi = tokens, lo, hi
+
+    def __len__(self):
+        return self.hi - self.lo
+
+    def __iter__(self):
+        tokens = self.tokens
+        return (tokens[i] for i in range(self.lo, self.hi))
+
+    def sample(self, size):
+        return self.tokens[self.lo:min(self.hi, self.lo + size)]
+
+
+class SearchIndex:
+    def __init__(self):
+        self.generation = None
+        self._rows = {}
+        # Each row's tokens as one '\x00tok\x00tok\x00' string, so checking a
+        # broad query word against a candidate is a single substring test.
+        self._row_text = {}
+        self._phrases = []
+        self._postings = {}
+        self._tokens = []
+        self._words = Counter()
+        self._trigrams = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def sync(self, conn, generation, batch_size=5000):
+        """Bring the index up to ``generation`` from the employees table.
+
+        Returns the number of rows re-indexed.  Searches keep being served
+        from the previous state while the table is read.
+        """
+        with self._sync_lock:
+            if generation == self.generation:
+                return 0
+            started = time.perf_counter()
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f'SELECT ID, Name, Email, Department, Designation FROM {TABLE}')
+                seen = set()
+                changed = []
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        row = tuple(row)
+                        seen.add(row[0])
+                        if self._rows.get(row[0]) != row:
+                            changed.append(row)
+            finally:
+                cursor.close()
+            removed = [emp_id for emp_id in self._rows if emp_id not in seen]
+            self.update(changed, removed)
+            self.generation = generation
+            logging.info(f"Search index at generation {generation}: {len(changed)} rows re-indexed, "
+                         f"{len(removed)} removed, {len(self._rows)} total in {time.perf_counter() - started:.2f}s")
+            return len(changed) + len(removed)
+
+    def start_sync(self, connect, generation):
+        """Sync on a daemon thread, using a connection from ``connect()``.
+
+        Does nothing while a sync is already running.
+        """
+        if self._sync_lock.locked():
+            return
+
+        def run():
+            try:
+                with connect() as conn:
+                    self.sync(conn, generation)
+            except Exception as e:
+                logging.error(f"Search index sync error: {e}")
+
+        threading.Thread(target=run, name='search-index', daemon=True).start()
+
+    def update(self, rows, removed_ids=()):
+        """Add or replace ``rows`` and drop ``removed_ids``."""
+        with self._lock:
+            added_tokens, dropped_tokens = set(), set()
+            added_phrases, dropped_phrases = set(), set()
+            for emp_id in removed_ids:
+                self._remove(emp_id, dropped_tokens, dropped_phrases)
+            for row in rows:
+                if row[0] in self._rows:
+                    self._remove(row[0], dropped_tokens, dropped_phrases)
+                self._add(row, added_tokens, added_phrases)
+            # An entry can be dropped and re-added (or the reverse) within one update.
+            both = added_phrases & dropped_phrases
+            self._phrases = patch_sorted(self._phrases, added_phrases - both, dropped_phrases - both)
+            self._tokens = patch_sorted(
+                self._tokens,
+                {token for token in added_tokens if token in self._postings},
+                {token for token in dropped_tokens if token not in self._postings}
+            )
+
+    def search(self, query, limit=DEFAULT_LIMIT, department=None, fuzzy=True):
+        """Return up to ``limit`` employee dicts matching every word of ``query``.
+
+        Rows whose Name or Email starts with the query come first, in
+        alphabetical order.
+        """
+        words = tokenize(query)
+        if not words or limit < 1:
+            return []
+        with self._lock:
+            found = {}
+            self._search_phrases(' '.join(words), limit, department, found)
+            if len(found) < limit:
+                self._search_tokens(list(dict.fromkeys(words)), limit, department, fuzzy, found)
+            return [dict(zip(SEARCH_FIELDS, row)) for row in found.values()]
+
+    def _search_phrases(self, phrase, limit, department, found):
+        phrases = self._phrases
+        i = bisect.bisect_left(phrases, phrase)
+        while i < len(phrases) and len(found) < limit and phrases[i].startswith(phrase):
+            emp_id = int(phrases[i].rsplit(SEP, 1)[1])
+            row = self._rows[emp_id]
+            if not department or row[3] == department:
+                found.setdefault(emp_id, row)
+            i += 1
+
+    def _search_tokens(self, words, limit, department, fuzzy, found):
+        matchers = []
+        for word in words:
+            lo = bisect.bisect_left(self._tokens, word)
+            hi = bisect.bisect_left(self._tokens, word + '\U0010ffff', lo)
+            if lo < hi:
+                tokens = self._tokens[lo:hi] if hi - lo <= VOLUME_SCAN_LIMIT else _TokenRange(self._tokens, lo, hi)
+                matchers.append((tokens, (SEP + word,)))
+            elif fuzzy and len(word) >= 3:
+                close = sorted(self._close_words(word))
+                if not close:
+                    return
+                matchers.append((close, tuple(f'{SEP}{token}{SEP}' for token in close)))
+            else:
+                return
+        id_sets, pattern_groups = [], []
+        if len(matchers) > 1:
+            volumes = sorted((self._volume(tokens), i) for i, (tokens, _) in enumerate(matchers))
+            matchers = [matchers[i] for _, i in volumes]
+            for (volume, _), (tokens, patterns) in zip(volumes[1:], matchers[1:]):
+                # Merging the word's postings costs ``volume`` set inserts;
+                # checking candidates instead stops after roughly enough of
+                # them to find ``limit`` matches at the word's frequency.
+                scanned = min(volumes[0][0], limit * len(self._rows) / max(volume, 1))
+                if len(tokens) == 1:
+                    id_sets.append(self._postings[next(iter(tokens))])
+                elif volume * UNION_COST <= scanned:
+                    id_sets.append(set().union(*(self._postings[token] for token in tokens)))
+                else:
+                    pattern_groups.append(patterns)
+
+        for token in matchers[0][0]:
+            candidates = iter(self._postings[token])
+            while True:
+                chunk = list(islice(candidates, SCAN_CHUNK))
+                if not chunk:
+                    break
+                for emp_id in self._filter(chunk, department, id_sets, pattern_groups):
+                    if emp_id not in found:
+                        found[emp_id] = self._rows[emp_id]
+                        if len(found) >= limit:
+                            return
+
+    def _filter(self, ids, department, id_sets, pattern_groups):
+        for id_set in id_sets:
+            ids = [emp_id for emp_id in ids if emp_id in id_set]
+        if department:
+            rows = self._rows
+            ids = [emp_id for emp_id in ids if rows[emp_id][3] == department]
+        texts = self._row_text
+        for patterns in pattern_groups:
+            if len(patterns) == 1:
+                pattern = patterns[0]
+                ids = [emp_id for emp_id in ids if pattern in texts[emp_id]]
+            else:
+                ids = [emp_id for emp_id in ids if any(pattern in texts[emp_id] for pattern in patterns)]
+        return ids
+
+    def _volume(self, tokens):
+        """Number of postings under ``tokens``, estimated for very wide prefixes."""
+        if isinstance(tokens, _TokenRange):
+            sample = tokens.sample(SELECTIVITY_SAMPLE)
+            return sum(len(self._postings[token]) for token in sample) * len(tokens) // len(sample)
+        return sum(len(self._postings[token]) for token in tokens)
+
+    def _close_words(self, word):
+        limit = max_edits(word)
+        grams = trigrams(word)
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._trigrams.get(gram, ()))
+        # Each edit changes at most three trigrams, and a swap of two
+        # adjacent letters four.
+        needed = max(1, len(grams) - 4 * limit)
+        close = {candidate for candidate, shared in counts.items()
+                 if shared >= needed and edit_distance(word, candidate, limit) <= limit}
+        # In a word of four letters or fewer a swap can change every trigram,
+        # so swapped spellings are also looked up directly.
+        close.update(swapped for swapped in (word[:i] + word[i + 1] + word[i] + word[i + 2:]
+                                             for i in range(len(word) - 1)) if self._words[swapped])
+        return close
+
+    def _add(self, row, added_tokens, added_phrases):
+        emp_id = row[0]
+        tokens = row_tokens(row)
+        self._rows[emp_id] = row
+        self._row_text[emp_id] = SEP + SEP.join(tokens) + SEP
+        added_phrases.update(row_phrases(row))
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                added_tokens.add(token)
+            posting.add(emp_id)
+        for word in row_words(row):
+            if not self._words[word]:
+                for gram in trigrams(word):
+                    self._trigrams.setdefault(gram, set()).add(word)
+            self._words[word] += 1
+
+    def _remove(self, emp_id, dropped_tokens, dropped_phrases):
+        row = self._rows.pop(emp_id, None)
+        if row is None:
+            return
+        dropped_phrases.update(row_phrases(row))
+        for token in self._row_text.pop(emp_id)[1:-1].split(SEP):
+            posting = self._postings[token]
+            posting.discard(emp_id)
+            if not posting:
+                del self._postings[token]
+                dropped_tokens.add(token)
+        for word in row_words(row):
+            self._words[word] -= 1
+            if self._words[word]:
+                continue
+            del self._words[word]
+            for gram in trigrams(word):
+                grams = self._trigrams[gram]
+                grams.discard(word)
+                if not grams:
+                    del self._trigrams[gram]
+
+
+def _benchmark(rows=500_000, queries=2000):
+    import random
+    import statistics
+
+    random.seed(7)
+    syllables = ['an', 'be', 'car', 'dan', 'el', 'fi', 'ga', 'har', 'is', 'jo', 'ka', 'lo', 'mar', 'ni',
+                 'ol', 'pe', 'ra', 'sa', 'ta', 'vi', 'wen', 'ya', 'zo', 'son', 'ley', 'ton', 'ric', 'na']
+    first_names = sorted({''.join(random.sample(syllables, 2)).title() for _ in range(600)})
+    last_names = sorted({''.join(random.sample(syllables, 3)).title() for _ in range(4000)})
+    titles = ['Software Engineer', 'Senior Software Engineer', 'Data Analyst', 'Product Manager',
+              'HR Specialist', 'Accountant', 'Sales Executive', 'Support Engineer', 'Designer', 'Team Lead']
+    data = []
+    mailboxes = Counter()
+    for i in range(1, rows + 1):
+        first, last = random.choice(first_names), random.choice(last_names)
+        mailbox = f'{first.lower()}.{last.lower()}'
+        mailboxes[mailbox] += 1
+        if mailboxes[mailbox] > 1:
+            mailbox += str(mailboxes[mailbox])
+        data.append((i, f'{first} {last}', f'{mailbox}@example.com', f'Dept {i % 25}', random.choice(titles)))
+
+    index = SearchIndex()
+    started = time.perf_counter()
+    index.update(data)
+    print(f"build, {rows} rows:             {time.perf_counter() - started:.2f}s")
+
+    changed = [(emp_id, name + ' Jr', email, dept, title) for emp_id, name, email, dept, title in data[:100]]
+    started = time.perf_counter()
+    index.update(changed, removed_ids=[data[-1][0]])
+    print(f"incremental, 100 rows changed: {(time.perf_counter() - started) * 1000:.2f}ms")
+
+    def typeahead(row):
+        first, last = row[1].lower().split()
+        return random.choice([first[:1], first[:2], first[:3], first, f'{first} {last[:2]}', f'{first} {last}'])
+
+    def out_of_order(row):
+        first, last = row[1].lower().split()
+        return f'{last[:4]} {first[:2]}'
+
+    def typo(row):
+        word = row[1].split()[1].lower()
+        i = random.randrange(1, len(word) - 1)
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+    samples = random.sample(data, queries)
+    cases = {
+        'name typeahead': [typeahead(row) for row in samples],
+        'email prefix': [row[2][:random.randint(3, 12)] for row in samples],
+        'last name then first': [out_of_order(row) for row in samples],
+        'designation words': [random.choice(['eng', 'soft eng', 'senior', 'data an', 'lead']) for _ in samples],
+        'fuzzy (one typo)': [typo(row) for row in samples],
+    }
+    for label, terms in cases.items():
+        timings, hits = [], 0
+        for term in terms:
+            started = time.perf_counter()
+            found = index.search(term)
+            timings.append((time.perf_counter() - started) * 1e6)
+            hits += bool(found)
+        timings.sort()
+        print(f"{label + ':':<31}p50 {statistics.median(timings):7.1f}us  "
+              f"p99 {timings[int(len(timings) * 0.99)]:7.1f}us  {hits}/{len(terms)} found")
+        # Timing lookups that find nothing would not measure the search.
+        assert hits >= len(terms) * 0.9, f'{label}: only {hits} of {len(terms)} queries found a row'
+
+    # What the browser did before: scan every row of the roster for the text.
+    started = time.perf_counter()
+    for term in cases['name typeahead'][:20]:
+        needle = term.lower()
+        [row for row in data if needle in row[1].lower() or needle in row[2] or needle in row[4].lower()][:DEFAULT_LIMIT]
+    print(f"linear scan (for comparison):  {(time.perf_counter() - started) / 20 * 1000:.1f}ms per query")
+
+
+if __name__ == '__main__':
+    import sys
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
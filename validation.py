@@ -0,0 +1,220 @@
+"""Vectorized validation for uploaded employee data.
+
+Every rule is evaluated over whole columns with NumPy/pandas operations, and
+all failures are collected into a ValidationReport (row number, column,
+rule, value) instead of stopping at the first bad cell.  Rows with an empty
+required cell are skipped, as the upload always has.
+"""
+import re
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from bulk_loader import EMPLOYEE_COLUMNS
+
+EMAIL_REGEX = r'^[\w\.-]+@[\w\.-]+\.\w+$'
+EMAIL_PATTERN = re.compile(EMAIL_REGEX)
+
+# NVARCHAR limits from create_table.sql
+COLUMN_LIMITS = {'Name': 100, 'Email': 100, 'Department': 50, 'Designation': 50}
+
+NUMERIC_TYPES = (int, float, np.int64, np.float64, np.int32, np.float32)
+
+REPORT_COLUMNS = ['row', 'column', 'rule', 'value']
+
+
+class ValidationReport:
+    """Collects validation errors; at most ``max_errors`` are kept in detail."""
+
+    def __init__(self, max_errors=10000):
+        self.max_errors = max_errors
+        self.error_count = 0
+        self.rule_counts = Counter()
+        self._frames = []
+        self._stored = 0
+
+    @property
+    def ok(self):
+        return self.error_count == 0
+
+    def add(self, errors):
+        if errors.empty:
+            return
+        self.error_count += len(errors)
+        self.rule_counts.update(errors['rule'].value_counts().to_dict())
+        room = self.max_errors - self._stored
+        if room > 0:
+            kept = errors.iloc[:room]
+            self._frames.append(kept)
+            self._stored += len(kept)
+
+    def to_frame(self):
+        if not self._frames:
+            return pd.DataFrame(columns=REPORT_COLUMNS)
+        return pd.concat(self._frames, ignore_index=True).sort_values(['row', 'column'], kind='stable')
+
+    def write_csv(self, path):
+        self.to_frame().to_csv(path, index=False)
+
+    def summary(self):
+        rules = ', '.join(f'{rule}: {count}' for rule, count in self.rule_counts.most_common())
+        return f'Found {self.error_count} validation errors ({rules})'
+
+
+class EmployeeValidator:
+    """Validates frames chunk by chunk; ID uniqueness is tracked across chunks."""
+
+    def __init__(self, report=None):
+        self.report = report if report is not None else ValidationReport()
+        self._seen_ids = np.empty(0, dtype=np.int64)
+
+    def validate(self, df, first_row=2):
+        """Check ``df`` and return its valid rows with ID as int64 and text columns as str.
+
+        ``first_row`` is the spreadsheet row number of ``df``'s first row.
+        """
+        df = df[list(EMPLOYEE_COLUMNS)].reset_index(drop=True)
+        rows = np.arange(first_row, first_row + len(df))
+
+        # One length pass per text column serves both the blank-cell check
+        # and the NVARCHAR limits.
+        texts = {column: np.asarray(df[column].array, dtype=object) for column in COLUMN_LIMITS}
+        lengths = {column: _text_lengths(values) for column, values in texts.items()}
+        blank = df['ID'].isna().to_numpy().copy()
+        for column in COLUMN_LIMITS:
+            blank |= lengths[column] == 0
+        if blank.any():
+            df = df[~blank].reset_index(drop=True)
+            rows = rows[~blank]
+            texts = {column: values[~blank] for column, values in texts.items()}
+            lengths = {column: values[~blank] for column, values in lengths.items()}
+        failed = np.zeros(len(df), dtype=bool)
+        errors = []
+
+        def record(mask, column, rule):
+            if mask.any():
+                errors.append(pd.DataFrame({
+                    'row': rows[mask],
+                    'column': column,
+                    'rule': rule,
+                    'value': df[column][mask].astype(str).str.slice(0, 120).to_numpy(),
+                }))
+                failed[mask] = True
+
+        is_integer, id_values = _integer_ids(df['ID'])
+        record(~is_integer, 'ID', 'integer')
+        record(self._duplicate_ids(id_values, is_integer), 'ID', 'unique')
+
+        record(~_email_mask(texts['Email']), 'Email', 'email')
+
+        for column, limit in COLUMN_LIMITS.items():
+            record(lengths[column] > limit, column, f'max_length_{limit}')
+
+        if errors:
+            self.report.add(pd.concat(errors, ignore_index=True))
+            valid = ~failed
+            df = df[valid].reset_index(drop=True)
+            id_values = id_values[valid]
+        clean = df.astype({col: str for col in COLUMN_LIMITS})
+        clean['ID'] = id_values
+        return clean
+
+    def _duplicate_ids(self, id_values, is_integer):
+        """Flag IDs repeated within the frame or seen in an earlier frame."""
+        duplicate = np.zeros(len(id_values), dtype=bool)
+        candidates = id_values[is_integer]
+        if not len(candidates):
+            return duplicate
+        seen = self._seen_ids
+        pos = np.searchsorted(seen, candidates)
+        in_seen = np.zeros(len(candidates), dtype=bool)
+        if len(seen):
+            in_seen = seen[np.minimum(pos, len(seen) - 1)] == candidates
+        repeated = pd.Series(candidates).duplicated().to_numpy() | in_seen
+        duplicate[np.flatnonzero(is_integer)[repeated]] = True
+
+        new_ids = np.sort(candidates[~in_seen])
+        if len(new_ids):
+            new_ids = new_ids[np.concatenate(([True], new_ids[1:] != new_ids[:-1]))]
+        self._seen_ids = np.insert(seen, np.searchsorted(seen, new_ids), new_ids)
+        return duplicate
+
+
+def _text_lengths(values):
+    """Length of each cell as text; missing cells count as empty."""
+    try:
+        return np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    except TypeError:
+        missing = pd.isna(values)
+        return np.fromiter((0 if m else len(str(v)) for v, m in zip(values, missing)),
+                           dtype=np.int64, count=len(values))
+
+
+def _email_mask(values):
+    """Match the email pattern against an object array; non-text cells never match."""
+    try:
+        return np.fromiter(map(bool, map(EMAIL_PATTERN.search, values)), dtype=bool, count=len(values))
+    except TypeError:
+        return np.fromiter((isinstance(v, str) and EMAIL_PATTERN.search(v) is not None for v in values),
+                           dtype=bool, count=len(values))
+
+
+def _integer_ids(column):
+    """Return (is_integer mask, int64 values) for an ID column."""
+    size = len(column)
+    if pd.api.types.is_bool_dtype(column):
+        return np.zeros(size, dtype=bool), np.zeros(size, dtype=np.int64)
+    if pd.api.types.is_integer_dtype(column):
+        return np.ones(size, dtype=bool), column.to_numpy(dtype=np.int64)
+    if pd.api.types.is_float_dtype(column):
+        values = column.to_numpy(dtype=float)
+    else:
+        # Text cells are rejected even when they look numeric, as before.
+        numeric_kind = column.map(type).isin(NUMERIC_TYPES).to_numpy()
+        values = pd.to_numeric(column.where(numeric_kind), errors='coerce').to_numpy(dtype=float)
+    with np.errstate(invalid='ignore'):
+        is_integer = np.isfinite(values) & (values == np.floor(values))
+    id_values = np.zeros(size, dtype=np.int64)
+    id_values[is_integer] = values[is_integer].astype(np.int64)
+    return is_integer, id_values
+
+
+def _legacy_validate(df):
+    """The per-element checks dashboard.upload used to run, for comparison."""
+    df = df[list(EMPLOYEE_COLUMNS)].dropna()
+    ids_ok = df['ID'].apply(lambda x: isinstance(x, (int, float)) and x == int(x)).all()
+    unique_ok = not df['ID'].duplicated().any()
+    emails_ok = df['Email'].str.contains(EMAIL_REGEX).all()
+    return ids_ok and unique_ok and emails_ok
+
+
+def _benchmark(rows=1_000_000):
+    # Column types as pd.read_excel returns them for a well-formed sheet.
+    ids = np.arange(1, rows + 1)
+    df = pd.DataFrame({
+        'ID': ids,
+        'Name': [f'Employee {i}' for i in ids],
+        'Email': [f'employee{i}@example.com' for i in ids],
+        'Department': [f'Dept {i % 25}' for i in ids],
+        'Designation': [f'Designation {i % 40}' for i in ids],
+    })
+
+    started = time.perf_counter()
+    _legacy_validate(df)
+    legacy = time.perf_counter() - started
+
+    started = time.perf_counter()
+    validator = EmployeeValidator()
+    clean = validator.validate(df)
+    vectorized = time.perf_counter() - started
+
+    assert validator.report.ok and len(clean) == rows
+    print(f"legacy apply-based checks (3 rules):        {legacy:.2f}s")
+    print(f"vectorized validation (all rules + report): {vectorized:.2f}s")
+
+
+if __name__ == '__main__':
+    import sys
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,147 @@
+"""Upload templates, built in memory and cached per schema and dataset generation.
+
+Three kinds of template can be downloaded:
+
+* ``blank``       - the header row and one sample employee;
+* ``departments`` - the header row, with the Department column limited to a
+  drop-down of the live departments (listed on a second sheet);
+* ``roster``      - the live roster, for editing and uploading again (in
+  merge mode only the changed rows are written).
+
+Workbooks are written with openpyxl's write-only mode straight into a
+``BytesIO`` and the bytes are kept until the schema (the upload columns)
+or, for the prefilled kinds, the dataset generation changes.  Concurrent
+downloads of a kind that is not cached wait for one build instead of each
+writing their own file.
+"""
+import io
+import logging
+import threading
+import time
+import zlib
+
+from bulk_loader import EMPLOYEE_COLUMNS
+
+TEMPLATE_KINDS = ('blank', 'departments', 'roster')
+TEMPLATE_NAMES = {
+    'blank': 'employees_template.xlsx',
+    'departments': 'employees_template.xlsx',
+    'roster': 'employees_roster.xlsx',
+}
+SAMPLE_ROW = (1, 'John Doe', 'john.doe@example.com', 'IT', 'Software Engineer')
+COLUMN_WIDTHS = {'ID': 10, 'Name': 28, 'Email': 36, 'Department': 20, 'Designation': 28}
+
+# One worksheet holds at most 1,048,576 rows, including the header.
+MAX_ROWS = 1_048_575
+
+# Changes whenever the upload columns do, so cached templates (and the
+# ETags browsers hold) from an older schema are never served.
+SCHEMA_VERSION = f'{zlib.crc32(repr(EMPLOYEE_COLUMNS).encode()):08x}'
+
+
+class TemplateTooLarge(Exception):
+    pass
+
+
+def build_template(rows=(SAMPLE_ROW,), departments=()):
+    """Return the bytes of an upload-ready workbook holding ``rows``.
+
+    With ``departments``, the Department column only accepts those values.
+    """
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+    from openpyxl.worksheet.datavalidation import DataValidation
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Employees')
+    sheet.freeze_panes = 'A2'
+    for index, column in enumerate(EMPLOYEE_COLUMNS, 1):
+        sheet.column_dimensions[get_column_letter(index)].width = COLUMN_WIDTHS.get(column, 20)
+    if departments:
+        letter = get_column_letter(EMPLOYEE_COLUMNS.index('Department') + 1)
+        validation = DataValidation(type='list', formula1=f'Departments!$A$2:$A${len(departments) + 1}',
+                                    allow_blank=True, showErrorMessage=True,
+                                    errorStyle='stop', errorTitle='Unknown department',
+                                    error='Choose a department from the list on the Departments sheet.')
+        validation.add(f'{letter}2:{letter}{MAX_ROWS + 1}')
+        sheet.data_validations.append(validation)
+
+    sheet.append(EMPLOYEE_COLUMNS)
+    count = 0
+    for row in rows:
+        count += 1
+        if count > MAX_ROWS:
+            raise TemplateTooLarge(f'A worksheet holds at most {MAX_ROWS} employees; use the XLSX export instead')
+        sheet.append(list(row))
+
+    if departments:
+        lists = workbook.create_sheet('Departments')
+        lists.append(['Department'])
+        for department in departments:
+            lists.append([department])
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+class TemplateCache:
+    """The latest bytes of each template kind, tagged with the version they were built for.
+
+    A version is ``(SCHEMA_VERSION, generation)``; the blank template does
+    not depend on the data and is always built for generation 0.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._locks = {kind: threading.Lock() for kind in TEMPLATE_KINDS}
+
+    def get(self, kind, version, build):
+        """Bytes of the ``kind`` template at ``version``, calling ``build()`` when not cached."""
+        entry = self._entries.get(kind)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        with self._locks[kind]:
+            entry = self._entries.get(kind)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+            started = time.perf_counter()
+            data = build()
+            self._entries[kind] = (version, data)
+            logging.info(f"Built {kind} template for {version}: {len(data)} bytes "
+                         f"in {time.perf_counter() - started:.2f}s")
+            return data
+
+
+def _benchmark(requests=50):
+    """Per-download cost of the previous pandas path against the cached template."""
+    import os
+    import tempfile
+
+    started = time.perf_counter()
+    import pandas as pd
+    print(f"pandas import:           {(time.perf_counter() - started) * 1000:8.1f}ms (once per worker)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'employees_template.xlsx')
+        started = time.perf_counter()
+        for _ in range(requests):
+            pd.DataFrame([dict(zip(EMPLOYEE_COLUMNS, SAMPLE_ROW))]).to_excel(path, index=False)
+            with open(path, 'rb') as f:
+                f.read()
+        print(f"DataFrame.to_excel:      {(time.perf_counter() - started) / requests * 1000:8.2f}ms per download")
+
+    cache = TemplateCache()
+    version = (SCHEMA_VERSION, 0)
+    started = time.perf_counter()
+    cache.get('blank', version, build_template)
+    print(f"build_template:          {(time.perf_counter() - started) * 1000:8.2f}ms (first download)")
+    started = time.perf_counter()
+    for _ in range(requests):
+        io.BytesIO(cache.get('blank', version, build_template)).read()
+    print(f"cached template:         {(time.perf_counter() - started) / requests * 1000:8.4f}ms per download")
+
+
+if __name__ == '__main__':
+    import sys
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,26 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Importing this module configures logging and creates the schema.  Under
+gunicorn that happens once in the master (``preload_app``), and every
+forked worker then only opens its own connections and resumes import jobs
+from the ``post_fork`` hook in ``gunicorn.conf.py``.  Other WSGI servers
+import the module in each process, which does both steps at once.
+"""
+import logging
+import os
+import sys
+
+from app import app, db_pool, init_db, start_worker
+
+logging.basicConfig(filename=os.getenv('LOG_FILE', 'app.log'), level=logging.INFO)
+init_db()
+if 'gunicorn' in sys.modules:
+    # Connections opened while creating the schema must not be shared with
+    # the workers forked from this process.
+    db_pool.close()
+else:
+    start_worker()
+
+__all__ = ['app', 'start_worker']